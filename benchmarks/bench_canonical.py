@@ -0,0 +1,96 @@
+''' Frontier keys before and after utils.canonical, and its throughput.
+
+    python -m benchmarks.bench_canonical [--corpus recording.jsonl]
+
+With --corpus the links of every recorded page are extracted (see
+utils/replay.py); otherwise a synthetic link mix is generated with the
+variants one page is linked by in practice: host case, default ports,
+index pages, parameter order, tracking and session parameters,
+percent-encoding, fragments and trailing slashes. '''
+import time
+import base64
+import random
+import argparse
+
+from urllib.parse import urldefrag
+
+from utils import hash_url, get_urlhash
+from utils.canonical import get_canonicalizer
+
+
+def legacy_urlhash(url):
+    # frontier key before utils.canonical: defragmented, trailing slash
+    # stripped, hashed as given
+    return hash_url(urldefrag(url)[0].rstrip("/"))
+
+
+def synthetic_links(count, seed=0):
+    rng = random.Random(seed)
+    hosts = ["www.ics.uci.edu", "www.cs.uci.edu", "www.stat.uci.edu"]
+    links = list()
+    for i in range(count):
+        host = rng.choice(hosts)
+        page = f"/people/user{i % 2000}"
+        variant = rng.random()
+        if variant < 0.3:
+            links.append(f"https://{host}{page}")
+        elif variant < 0.4:
+            links.append(f"https://{host.upper()}{page}/")
+        elif variant < 0.5:
+            links.append(f"https://{host}:443{page}/index.html")
+        elif variant < 0.6:
+            links.append(f"https://{host}{page}?b={i % 3}&a=1")
+        elif variant < 0.7:
+            links.append(f"https://{host}{page}?a=1&b={i % 3}")
+        elif variant < 0.8:
+            links.append(
+                f"https://{host}{page}?utm_source=feed&utm_medium={i % 7}")
+        elif variant < 0.9:
+            links.append(
+                f"https://{host}{page};jsessionid={rng.getrandbits(32):x}")
+        elif variant < 0.95:
+            links.append(f"https://{host}/people/%75ser{i % 2000}#bio")
+        else:
+            links.append(f"https://{host}/news/../people/user{i % 2000}")
+    return links
+
+
+def recorded_links(path):
+    from utils.page import parse_page
+    from utils.replay import load_recordings
+    links = list()
+    for url, record in load_recordings(path).items():
+        if record["status"] == 200:
+            content = base64.b64decode(record.get("content", ""))
+            links.extend(parse_page(url, content).links)
+    return links
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=None)
+    parser.add_argument("--links", type=int, default=200000)
+    args = parser.parse_args()
+    if args.corpus:
+        links = recorded_links(args.corpus)
+    else:
+        links = synthetic_links(args.links)
+
+    before = len(set(map(legacy_urlhash, links)))
+    after = len(set(map(get_urlhash, links)))
+    print(f"{'links':>10}: {len(links):,}")
+    print(f"{'before':>10}: {before:,} frontier entries")
+    print(f"{'after':>10}: {after:,} frontier entries "
+          f"({100 * (before - after) / max(before, 1):.1f}% fewer)")
+
+    # uncached, as for links seen once
+    uncached = get_canonicalizer()._canonical
+    start = time.perf_counter()
+    for link in links:
+        uncached(link)
+    elapsed = time.perf_counter() - start
+    print(f"{'canonical':>10}: {len(links) / elapsed:12,.0f} links/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+''' Throughput of the frontier, scraper, downloader and the whole crawler.
+
+    python -m benchmarks.bench_crawl [--corpus recording.jsonl] [--pages N]
+                                     [--workers 1,4,16] [--latency SECONDS]
+
+Every (component, worker count) pair runs in a fresh process inside a
+temporary directory, against a local ReplayServer serving either a
+recording made with ``launch.py --record`` or a generated site. Reported
+per run: pages/s, CPU ms per page and the peak RSS of that process. '''
+import os
+import sys
+import json
+import time
+import base64
+import random
+import resource
+import tempfile
+import multiprocessing
+
+from argparse import ArgumentParser
+from configparser import ConfigParser
+from threading import Thread
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOSTS = [
+    "www.ics.uci.edu", "www.cs.uci.edu", "www.informatics.uci.edu",
+    "www.stat.uci.edu", "vision.ics.uci.edu", "sdcl.ics.uci.edu",
+    "hpi.ics.uci.edu", "ml.ics.uci.edu"]
+
+
+def synthetic_corpus(pages, seed=0):
+    # A site of `pages` pages spread over HOSTS, each linking to 20 others
+    # and carrying a few hundred words of text.
+    rng = random.Random(seed)
+    urls = [f"https://{HOSTS[i % len(HOSTS)]}/page{i}" for i in range(pages)]
+    vocabulary = (
+        "research computer science students faculty data learning systems "
+        "graduate course information software network security theory "
+        "algorithms statistics design human interaction program project").split()
+    recordings = dict()
+    for i, url in enumerate(urls):
+        links = "".join(
+            f'<li><a href="{rng.choice(urls)}">link</a></li>' for _ in range(20))
+        text = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(100, 600)))
+        html = (f"<html><head><title>Page {i}</title></head><body>"
+                f"<p>{text}</p><ul>{links}</ul></body></html>")
+        recordings[url] = {
+            "url": url, "status": 200,
+            "headers": {"Content-Type": "text/html; charset=utf-8"},
+            "content": base64.b64encode(html.encode("utf-8")).decode("ascii")}
+    # the seeds must be in the recording
+    for host in HOSTS[:4]:
+        recordings[f"https://{host}"] = recordings[urls[HOSTS.index(host)]]
+    return recordings
+
+
+def make_config(save_dir, workers, cache_server):
+    from utils.config import Config
+    cparser = ConfigParser()
+    cparser.read(os.path.join(ROOT, "config.ini"))
+    cparser["CRAWLER"]["SEEDURL"] = ",".join(f"https://{host}" for host in HOSTS[:4])
+    cparser["CRAWLER"]["POLITENESS"] = "0"
+    cparser["LOCAL PROPERTIES"]["THREADCOUNT"] = str(workers)
+    cparser["LOCAL PROPERTIES"]["PROCESSCOUNT"] = "1"
+    cparser["LOCAL PROPERTIES"]["METRICS_PORT"] = "0"
+    cparser["LOCAL PROPERTIES"]["METRICS_LOG_INTERVAL"] = "0"
+    cparser["LOCAL PROPERTIES"]["SAVE"] = os.path.join(save_dir, "frontier.shelve")
+    cparser["LOCAL PROPERTIES"]["DATA_REPORT"] = os.path.join(save_dir, "data_report.txt")
+    config = Config(cparser)
+    config.cache_server = cache_server
+    return config
+
+
+def run_threads(workers, target):
+    threads = [Thread(target=target, args=(worker,)) for worker in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def bench_frontier(config, recordings, workers):
+    from crawler.frontier import Frontier
+    frontier = Frontier(config, True)
+    for url in recordings:
+        frontier.add_url(url)
+    done = [0] * workers
+
+    def work(worker):
+        while True:
+            url = frontier.get_tbd_url()
+            if url is None:
+                break
+            frontier.mark_url_complete(url)
+            done[worker] += 1
+
+    run_threads(workers, work)
+    frontier.close()
+    return sum(done)
+
+
+def bench_downloader(config, recordings, workers):
+    from utils.download import download
+    urls = list(recordings)
+
+    def work(worker):
+        for url in urls[worker::workers]:
+            download(url, config)
+
+    run_threads(workers, work)
+    return len(urls)
+
+
+def bench_scraper(config, recordings, workers):
+    import scraper
+    from utils.download import download
+    scraper.init_analytics(config.data_report, restart=True)
+    responses = [(url, download(url, config)) for url in recordings]
+    start = time.perf_counter()
+
+    def work(worker):
+        for url, resp in responses[worker::workers]:
+            scraper.scraper(url, resp)
+
+    run_threads(workers, work)
+    scraper.get_analytics().close()
+    # only the scraping is timed; report it through the caller's clock
+    return len(responses), time.perf_counter() - start
+
+
+def bench_crawler(config, recordings, workers):
+    from crawler import Crawler
+    from utils.metrics import METRICS
+    Crawler(config, True).start()
+    return int(METRICS.counter_total("crawler_pages_total"))
+
+
+BENCHMARKS = {
+    "frontier": bench_frontier,
+    "downloader": bench_downloader,
+    "scraper": bench_scraper,
+    "crawler": bench_crawler,
+}
+
+
+def run_one(name, workers, recordings, latency, results):
+    # child process: isolated memory, own temporary save files
+    sys.path.insert(0, ROOT)
+    import logging
+    logging.disable(logging.INFO)
+    from utils.replay import ReplayServer
+    with tempfile.TemporaryDirectory() as save_dir:
+        os.chdir(save_dir)
+        server = ReplayServer(recordings, latency=latency)
+        server.start()
+        config = make_config(save_dir, workers, server.address)
+        before = resource.getrusage(resource.RUSAGE_SELF)
+        start = time.perf_counter()
+        outcome = BENCHMARKS[name](config, recordings, workers)
+        elapsed = time.perf_counter() - start
+        after = resource.getrusage(resource.RUSAGE_SELF)
+        server.stop()
+    pages, elapsed = outcome if isinstance(outcome, tuple) else (outcome, elapsed)
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    results.put({
+        "benchmark": name, "workers": workers, "pages": pages,
+        "pages_per_sec": pages / elapsed if elapsed else 0.0,
+        "cpu_ms_per_page": cpu * 1000 / pages if pages else 0.0,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mib": after.ru_maxrss / 1024})
+
+
+def main(argv=None):
+    parser = ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--corpus", default=None)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--workers", default="1,4,16")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds the stand-in cache server waits per request")
+    parser.add_argument("--only", default=",".join(BENCHMARKS))
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.corpus:
+        from utils.replay import load_recordings
+        recordings = load_recordings(args.corpus)
+    else:
+        recordings = synthetic_corpus(args.pages)
+
+    results = multiprocessing.Queue()
+    rows = list()
+    for name in args.only.split(","):
+        for workers in (int(count) for count in args.workers.split(",")):
+            process = multiprocessing.Process(
+                target=run_one,
+                args=(name, workers, recordings, args.latency, results))
+            process.start()
+            rows.append(results.get())
+            process.join()
+            row = rows[-1]
+            if not args.json:
+                print(f"{row['benchmark']:>10} x{row['workers']:<3}"
+                      f"{row['pages_per_sec']:10,.1f} pages/s"
+                      f"{row['cpu_ms_per_page']:9.2f} CPU ms/page"
+                      f"{row['peak_rss_mib']:9.1f} MiB peak RSS")
+    if args.json:
+        print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
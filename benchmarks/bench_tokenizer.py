@@ -0,0 +1,55 @@
+''' Words counted per second, original word filtering vs utils.tokenizer.
+
+    python -m benchmarks.bench_tokenizer saved_page.html [...]
+
+Each saved page is parsed once up front; only tokenising and filtering
+are timed. '''
+import sys
+import time
+
+from nltk.corpus import words as english
+
+from stopwords import STOPWORDS
+from utils.page import parse_page
+from utils.tokenizer import count_words
+
+ENGLISH_WORDS = set(english.words())
+
+
+def legacy_words(text):
+    # scraper.py before utils.tokenizer: whitespace split of the glued
+    # get_text output, then a per-word list comprehension
+    words = text.split()
+    return [word.lower() for word in words
+            if word.lower() not in STOPWORDS and word in ENGLISH_WORDS]
+
+
+def bench(name, function, texts, repeat):
+    start = time.perf_counter()
+    kept = 0
+    for _ in range(repeat):
+        for text in texts:
+            result = function(text)
+            kept += sum(result.values()) if hasattr(result, "values") else len(result)
+    elapsed = time.perf_counter() - start
+    tokens = sum(len(text.split()) for text in texts) * repeat
+    print(f"{name:>10}: {tokens / elapsed:12,.0f} tokens/s, "
+          f"{elapsed / (len(texts) * repeat) * 1000:.3f} ms/page, "
+          f"{kept // repeat} words kept")
+    return elapsed
+
+
+def main(paths, repeat=5):
+    pages = list()
+    for path in paths:
+        with open(path, "rb") as file:
+            pages.append(parse_page(f"file://{path}", file.read()))
+    if not pages:
+        sys.exit("usage: python -m benchmarks.bench_tokenizer page.html [...]")
+    before = bench("before", legacy_words, [page.get_text() for page in pages], repeat)
+    after = bench("after", count_words, [page.get_text(" ") for page in pages], repeat)
+    print(f"{'speedup':>10}: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
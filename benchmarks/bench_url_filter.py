@@ -0,0 +1,119 @@
+''' Links validated per second, original is_valid rules vs utils.url_filter.
+
+    python -m benchmarks.bench_url_filter [urls.txt]
+
+Without a file, a synthetic link mix is generated: repeated navigation
+links, date-like calendar pages, binary files and off-domain links, the
+way extracted links repeat across pages of one site. '''
+import re
+import sys
+import time
+import random
+
+from urllib.parse import urlparse, parse_qs
+
+from utils.url_filter import UrlFilter
+
+
+def legacy_is_valid(url):
+    # scraper.is_valid as it was before utils.url_filter (minus the seen check)
+    def is_path_date(split_path):
+        pattern = r'\d{4}[-/.]?\d{2}[-/.]?\d{2}'
+        keywords = {"day", "month", "year", "date", "time"}
+        for part in split_path:
+            if (part.lower() in keywords):
+                return True
+            if (re.fullmatch(pattern, part)):
+                return True
+        return False
+
+    def is_query_date(query):
+        pattern = r'\d{4}[-/.]?\d{2}[-/.]?\d{2}'
+        keywords = {"day", "month", "year", "date", "time"}
+        for pair in query.items():
+            if (pair[0].lower() in keywords):
+                return True
+            for item in pair[1]:
+                if (re.fullmatch(pattern, item)):
+                    return True
+        return False
+
+    if ("#" in url):
+        url = url.split("#")[0]
+    parsed = urlparse(url)
+    if parsed.scheme not in set(["http", "https"]):
+        return False
+    domains = ["ics.uci.edu", "cs.uci.edu", "informatics.uci.edu", "stat.uci.edu"]
+    if parsed.hostname == "gitlab.ics.uci.edu":
+        return False
+    if not any(domain in parsed.netloc for domain in domains):
+        return False
+    if ("today.uci.edu" in parsed.netloc) and (parsed.path != "/department/information_computer_sciences/"):
+        return False
+    split_path = parsed.path.split("/")
+    query_dict = parse_qs(parsed.query)
+    if (is_path_date(split_path) or is_query_date(query_dict)):
+        return False
+    if re.match(
+            r".*\.(css|js|bmp|gif|jpe?g|ico"
+            + r"|png|tiff?|mid|mp2|mp3|mp4"
+            + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
+            + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
+            + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso|img"
+            + r"|epub|dll|cnf|tgz|sha1"
+            + r"|thmx|mso|arff|rtf|jar|csv"
+            + r"|rm|smil|wmv|swf|wma|zip|rar|gz"
+            + r"|sql|apk|bat)$", parsed.path.lower()):
+        return False
+    return True
+
+
+def synthetic_links(count, seed=0):
+    rng = random.Random(seed)
+    hosts = [
+        "www.ics.uci.edu", "www.cs.uci.edu", "www.informatics.uci.edu",
+        "www.stat.uci.edu", "vision.ics.uci.edu", "gitlab.ics.uci.edu",
+        "www.google.com", "today.uci.edu"]
+    navigation = [
+        f"https://{rng.choice(hosts)}/{section}/"
+        for section in ("about", "people", "research", "courses", "news")]
+    links = list()
+    for i in range(count):
+        kind = rng.random()
+        host = rng.choice(hosts)
+        if kind < 0.5:
+            links.append(rng.choice(navigation))
+        elif kind < 0.65:
+            links.append(f"https://{host}/events/2019-{i % 12 + 1:02d}-01")
+        elif kind < 0.75:
+            links.append(f"https://{host}/files/paper{i % 500}.pdf")
+        elif kind < 0.85:
+            links.append(f"https://{host}/wiki/doku.php?id=page{i % 2000}&rev={i}")
+        else:
+            links.append(f"https://{host}/~user{i % 300}/index.html#top")
+    return links
+
+
+def bench(name, is_valid, links):
+    start = time.perf_counter()
+    accepted = sum(1 for link in links if is_valid(link))
+    elapsed = time.perf_counter() - start
+    print(f"{name:>10}: {len(links) / elapsed:12,.0f} links/s "
+          f"({accepted} of {len(links)} accepted)")
+    return elapsed
+
+
+def main(path=None):
+    if path:
+        with open(path) as file:
+            links = [line.strip() for line in file if line.strip()]
+    else:
+        links = synthetic_links(200000)
+    before = bench("before", legacy_is_valid, links)
+    url_filter = UrlFilter()
+    after = bench("after", lambda url: url_filter.check(url.split("#")[0]) is None, links)
+    print(f"{'speedup':>10}: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
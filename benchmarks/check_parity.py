@@ -0,0 +1,38 @@
+''' Parity of the single-pass page parser with the BeautifulSoup reference.
+
+    python -m benchmarks.check_parity [page.html ...]
+
+Without arguments, the saved pages in benchmarks/pages are checked: entity
+references, CDATA, <textarea>, invisible tags, comments and broken markup.
+Links and the get_text(" ") tokens the scraper counts must match, with the
+lxml parser (when installed) and the stdlib one. Exits non-zero on any
+difference. '''
+import os
+import sys
+import glob
+
+from utils.page import check_parity, etree
+
+PAGES = os.path.join(os.path.dirname(__file__), "pages")
+
+
+def main(paths):
+    if not paths:
+        paths = sorted(glob.glob(os.path.join(PAGES, "*.html")))
+    parsers = [False] if etree is None else [True, False]
+    failures = 0
+    for path in paths:
+        with open(path, "rb") as file:
+            content = file.read()
+        url = f"https://www.ics.uci.edu/pages/{os.path.basename(path)}"
+        for use_lxml in parsers:
+            for problem in check_parity(url, content, use_lxml):
+                failures += 1
+                print(f"{path} ({'lxml' if use_lxml else 'stdlib'}): "
+                      f"{problem}")
+    print(f"{len(paths)} pages checked, {failures} differences.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
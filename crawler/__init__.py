@@ -1,16 +1,116 @@
-from utils import get_logger
+import signal
+import threading
+
+from utils import get_logger, canonical
+from utils.metrics import MetricsServer, SummaryLogger
 from crawler.frontier import Frontier
 from crawler.worker import Worker
+from crawler.async_worker import AsyncWorker
+import scraper
+
+
+class Checkpointer(threading.Thread):
+    ''' Calls checkpoint every interval seconds until stopped. '''
+
+    def __init__(self, checkpoint, interval):
+        self.checkpoint = checkpoint
+        self.interval = interval
+        self.stopped = threading.Event()
+        super().__init__(daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.checkpoint()
+
+    def stop(self):
+        self.stopped.set()
+        if self.is_alive():
+            self.join()
+
 
 class Crawler(object):
+    ''' Runs the workers over one frontier and coordinates them.
+
+    stop() lets every worker finish the url it holds and then ends the
+    crawl with the rest still pending, so a later run without --restart
+    resumes where this one stopped. pause() holds the workers after their
+    current url until resume(). In the main thread, start() maps SIGINT
+    and SIGTERM to stop, SIGUSR1 to pause/resume and SIGUSR2 to an
+    immediate checkpoint. '''
+
     def __init__(self, config, restart, frontier_factory=Frontier, worker_factory=Worker):
         self.config = config
         self.logger = get_logger("CRAWLER")
+        canonical.configure(config.query_allow, config.query_deny)
         self.frontier = frontier_factory(config, restart)
+        self.analytics = scraper.init_analytics(
+            config.data_report, config.report_flush_every,
+            config.report_snapshot_every, restart, config.report_format)
         self.workers = list()
+        self.monitors = list()
+        self.closing = False
+        if worker_factory is Worker and config.download_mode == "async":
+            worker_factory = AsyncWorker
         self.worker_factory = worker_factory
 
+    def pause(self):
+        self.frontier.pause()
+        self.logger.info("Paused; urls in flight still complete.")
+
+    def resume(self):
+        self.frontier.resume()
+        self.logger.info("Resumed.")
+
+    def stop(self):
+        if not self.frontier.stopping:
+            self.logger.info(
+                f"Stopping: waiting for {len(self.frontier.in_flight)} urls "
+                f"in flight.")
+        self.frontier.stop()
+
+    def checkpoint(self):
+        # Analytics first, with the frontier locked so no url completes
+        # in between: every url completed in the frontier checkpoint has
+        # its words in the analytics snapshot.
+        with self.frontier.lock:
+            self.analytics.snapshot()
+            self.frontier.checkpoint()
+
+    def handle_signal(self, signum, frame):
+        if signum in (signal.SIGINT, signal.SIGTERM):
+            self.stop()
+        elif signum == getattr(signal, "SIGUSR1", None):
+            if self.frontier.paused:
+                self.resume()
+            else:
+                self.pause()
+        elif signum == getattr(signal, "SIGUSR2", None) and not self.closing:
+            self.checkpoint()
+            self.logger.info("Checkpoint written.")
+
+    def install_signal_handlers(self):
+        # only the main thread may set signal handlers
+        if threading.current_thread() is not threading.main_thread():
+            return
+        for name in ("SIGINT", "SIGTERM", "SIGUSR1", "SIGUSR2"):
+            if hasattr(signal, name):
+                signal.signal(getattr(signal, name), self.handle_signal)
+
     def start_async(self):
+        self.monitors = list()
+        if self.config.metrics_port:
+            self.monitors.append(MetricsServer(self.config.metrics_port))
+            self.logger.info(
+                f"Serving metrics on http://127.0.0.1:"
+                f"{self.config.metrics_port}/metrics.")
+        if self.config.metrics_log_interval > 0:
+            self.monitors.append(SummaryLogger(
+                get_logger("METRICS"), self.config.metrics_log_interval))
+        if self.config.checkpoint_interval > 0:
+            self.monitors.append(Checkpointer(
+                self.checkpoint, self.config.checkpoint_interval))
+        for monitor in self.monitors:
+            monitor.start()
         self.workers = [
             self.worker_factory(worker_id, self.config, self.frontier)
             for worker_id in range(self.config.threads_count)]
@@ -18,9 +118,20 @@ class Crawler(object):
             worker.start()
 
     def start(self):
+        self.install_signal_handlers()
         self.start_async()
         self.join()
 
     def join(self):
         for worker in self.workers:
             worker.join()
+        for monitor in self.monitors:
+            monitor.stop()
+        self.closing = True
+        if self.frontier.stopping:
+            self.logger.info(
+                f"Stopped with {self.frontier.queued_count()} urls pending; "
+                f"run again without --restart to resume.")
+        # analytics first, as in checkpoint
+        self.analytics.close()
+        self.frontier.close()
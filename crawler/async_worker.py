@@ -0,0 +1,50 @@
+import asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+
+from crawler.worker import Worker
+from utils.async_download import AsyncDownloader
+from utils.metrics import METRICS
+
+
+class AsyncWorker(Worker):
+    ''' Worker that keeps IN_FLIGHT downloads open at once on one event
+    loop. The frontier still checks hosts out one url at a time, so
+    per-host politeness is unchanged; blocking frontier calls and the
+    scraper run on a small thread pool next to the loop. '''
+
+    def run(self):
+        asyncio.run(self._run())
+
+    async def _run(self):
+        downloader = AsyncDownloader(self.config, self.logger)
+        await downloader.open()
+        try:
+            with ThreadPoolExecutor(self.config.in_flight) as pool:
+                await asyncio.gather(*[
+                    self._crawl(downloader, pool)
+                    for _ in range(self.config.in_flight)])
+        finally:
+            await downloader.close()
+        self.logger.info(
+            "Crawl stopped. Stopping worker." if self.frontier.stopping
+            else "Frontier is empty. Stopping Crawler.")
+
+    async def _crawl(self, downloader, pool):
+        loop = asyncio.get_running_loop()
+        while True:
+            tbd_url = await loop.run_in_executor(
+                pool, self.frontier.get_tbd_url)
+            if not tbd_url:
+                break
+            try:
+                if await loop.run_in_executor(pool, self.allowed, tbd_url):
+                    await loop.run_in_executor(
+                        pool, self.frontier.wait_for_host, tbd_url)
+                    with METRICS.time("fetch"):
+                        resp = await downloader.download(tbd_url)
+                    await loop.run_in_executor(
+                        pool, self.process, tbd_url, resp)
+            except Exception:
+                self.logger.exception(f"Failed to process {tbd_url}.")
+            self.frontier.mark_url_complete(tbd_url)
@@ -1,72 +1,430 @@
 import os
-import shelve
+import time
+import heapq
+import itertools
 
-from threading import Thread, RLock
-from queue import Queue, Empty
+from threading import RLock, Condition
+from urllib.parse import urlparse
 
-from utils import get_logger, get_urlhash, normalize
-from scraper import is_valid
+from utils import get_logger, get_urlhash, hash_url, normalize
+from utils import canonical
+from crawler.store import get_store_class
+from crawler.traps import TrapDetector, DEMOTE, DROP
+from crawler.scoring import Scorer
+from crawler.robots import PolicyStore
+from crawler.recrawl import RevisitPolicy, page_state
+from utils.seenset import SeenSet
+from utils.metrics import METRICS
+from scraper import is_valid, rules_fingerprint
 
 class Frontier(object):
     def __init__(self, config, restart):
         self.logger = get_logger("FRONTIER")
         self.config = config
-        self.to_be_downloaded = list()
+        # Per-host politeness scheduling. Every host has its own priority
+        # queue of urls; a host is either waiting in ready_heap (keyed by
+        # the time it may be contacted again, so hosts take turns) or
+        # checked out by a worker (busy_hosts).
+        self.lock = RLock()
+        self.has_work = Condition(self.lock)
+        self.host_queues = dict()
+        self.ready_heap = list()
+        self.scheduled_hosts = set()
+        self.busy_hosts = dict()
+        self.next_allowed = dict()
+        # When each host was last contacted by wait_for_host, which spaces
+        # the robots.txt, sitemap and page fetches of one checkout.
+        self.last_contact = dict()
+        # Within a host, urls with the lowest PRIORITY score go first, in
+        # discovery order on ties; in_flight has the depth of checked out
+        # urls, which their links inherit plus one.
+        self.scorer = Scorer.parse(self.config.priority)
+        self.sequence = itertools.count()
+        self.in_flight = dict()
+        # Urls put back by defer() when their host could not be crawled
+        # yet, and how often each was deferred.
+        self.deferring = set()
+        self.deferrals = dict()
+        # Set by the crawler: while paused no url is handed out; once
+        # stopping, get_tbd_url returns None and the urls still queued
+        # stay pending in the save file.
+        self.paused = False
+        self.stopping = False
+        # Cached robots.txt policies; workers fetch them, the scheduler
+        # only reads them (Disallow in add_url, Crawl-delay per host).
+        self.policies = (
+            PolicyStore.from_config(self.config) if self.config.robots
+            else None)
+        METRICS.register_gauge("crawler_host_queue_depth", self.queue_depths)
+        METRICS.register_gauge("crawler_urls_queued", self.queued_count)
+        METRICS.register_gauge(
+            "crawler_urls_in_flight", lambda: len(self.in_flight))
+        # Pages fetched and new urls found per url template (host, path
+        # shape, query keys); see crawler/traps.py.
+        self.traps = TrapDetector(
+            self.config.trap_budget, self.config.trap_min_pages,
+            self.config.trap_min_yield)
+        # Validators and body hash of every fetched page, saved with its
+        # completed record, so a re-crawl only revisits pages when due and
+        # only parses them again if they changed; see crawler/recrawl.py.
+        self.revisits = RevisitPolicy.from_config(self.config)
+        self.visited = dict()
         
-        if not os.path.exists(self.config.save_file) and not restart:
+        store_class = get_store_class(self.config)
+        self.seen_file = f"{self.config.save_file}.seen"
+        if not store_class.exists(self.config.save_file) and not restart:
             # Save file does not exist, but request to load save.
             self.logger.info(
                 f"Did not find save file {self.config.save_file}, "
                 f"starting from seed.")
-        elif os.path.exists(self.config.save_file) and restart:
+        elif store_class.exists(self.config.save_file) and restart:
             # Save file does exists, but request to start from seed.
             self.logger.info(
                 f"Found save file {self.config.save_file}, deleting it.")
-            os.remove(self.config.save_file)
+            store_class.remove(self.config.save_file)
+            if os.path.exists(self.seen_file):
+                os.remove(self.seen_file)
         # Load existing save file, or create one if it does not exist.
-        self.save = shelve.open(self.config.save_file)
+        # Writes are batched; see crawler/store.py.
+        self.save = store_class(
+            self.config.save_file, self.config.store_flush_count,
+            self.config.store_flush_interval)
+        # Every url hash ever added, as 64-bit digests in memory, so dedup
+        # in add_url never goes to disk.
+        self.seen = self._load_seen()
+        self.traps.load(self.save.get_meta("trap_templates"))
         if restart:
             for url in self.config.seed_urls:
                 self.add_url(url)
+            # everything in a fresh save file passed the current rules
+            self.save.set_meta("rules_fingerprint", rules_fingerprint())
+            self.save.set_meta(
+                "canonical_fingerprint", canonical.fingerprint())
         else:
             # Set the frontier state with contents of save file.
             self._parse_save_file()
+            if self.config.recrawl:
+                self._schedule_revisits()
             if not self.save:
                 for url in self.config.seed_urls:
                     self.add_url(url)
 
+    @staticmethod
+    def seen_digest(urlhash):
+        # the first 64 bits of the sha256 url hash
+        return int(urlhash[:16], 16)
+
+    def _load_seen(self):
+        count = len(self.save)
+        if (os.path.exists(self.seen_file)
+                and self.save.get_meta("seen_count") == count):
+            return SeenSet.load(self.seen_file, self.config.bloom_capacity)
+        # No dump, or one older than the save file: rebuild from its keys.
+        seen = SeenSet(max(count, 1 << 16), self.config.bloom_capacity)
+        for urlhash in self.save.keys():
+            seen.add(self.seen_digest(urlhash))
+        return seen
+
     def _parse_save_file(self):
         ''' This function can be overridden for alternate saving techniques. '''
+        # Only the pending index is loaded. is_valid is re-run on it only
+        # when the filter rules changed since the save file was written;
+        # urls the new rules reject, or of dropped trap templates, are
+        # retired as completed. Likewise, when the canonical form changed,
+        # urls saved in another form are retired and their canonical url
+        # is added instead. Saved urls are keyed by hash_url of the url as
+        # it was saved.
         total_count = len(self.save)
         tbd_count = 0
-        for url, completed in self.save.values():
-            if not completed and is_valid(url):
-                self.to_be_downloaded.append(url)
-                tbd_count += 1
+        fingerprint = rules_fingerprint()
+        revalidate = self.save.get_meta("rules_fingerprint") != fingerprint
+        canonical_fingerprint = canonical.fingerprint()
+        recanonicalize = (
+            self.save.get_meta("canonical_fingerprint") != canonical_fingerprint)
+        for url, completed, *info in self.save.pending():
+            depth = info[0].get("depth", 0) if info else 0
+            if recanonicalize and normalize(url) != url:
+                self.save[hash_url(url)] = (url, True)
+                if ((not revalidate or is_valid(normalize(url)))
+                        and self._add_url(url, depth)):
+                    tbd_count += 1
+                continue
+            if revalidate and not is_valid(url):
+                self.save[hash_url(url)] = (url, True)
+                continue
+            if self.traps.verdict(url) == DROP:
+                self.save[hash_url(url)] = (url, True)
+                continue
+            self._enqueue(url, depth)
+            tbd_count += 1
+        self.save.flush()
+        self.save.set_meta("rules_fingerprint", fingerprint)
+        self.save.set_meta("canonical_fingerprint", canonical_fingerprint)
         self.logger.info(
             f"Found {tbd_count} urls to be downloaded from {total_count} "
-            f"total urls discovered.")
+            f"total urls discovered"
+            f"{' (filter rules changed, revalidated)' if revalidate else ''}.")
+
+    def _schedule_revisits(self):
+        # Re-crawl: completed pages whose revisit interval has passed are
+        # pending again, with what is known about them kept in their info.
+        now = time.time()
+        due_count = 0
+        for url, completed, *info in self.save.values():
+            if not completed or not info or not info[0]:
+                continue
+            if not self.revisits.due(info[0], now):
+                continue
+            if self.traps.verdict(url) == DROP:
+                continue
+            self.save[hash_url(url)] = (url, False, info[0])
+            self._enqueue(url, info[0].get("depth", 0))
+            due_count += 1
+        self.save.flush()
+        self.logger.info(f"Re-crawl: {due_count} fetched urls are due again.")
+
+    @staticmethod
+    def get_host(url):
+        return urlparse(url).hostname or ""
+
+    def queue_depths(self):
+        with self.lock:
+            return [
+                ({"host": host}, len(queue))
+                for host, queue in self.host_queues.items()]
+
+    def queued_count(self):
+        with self.lock:
+            return sum(len(queue) for queue in self.host_queues.values())
+
+    def pause(self):
+        with self.lock:
+            self.paused = True
+
+    def resume(self):
+        with self.lock:
+            self.paused = False
+            self.has_work.notify_all()
+
+    def stop(self):
+        # Workers finish the url they hold, then get None.
+        with self.lock:
+            self.stopping = True
+            self.has_work.notify_all()
+
+    def _schedule(self, host, now):
+        # Put host back in the ready heap if it has urls and is idle.
+        if (host in self.scheduled_hosts or host in self.busy_hosts
+                or not self.host_queues.get(host)):
+            return
+        ready_at = max(now, self.next_allowed.get(host, now))
+        heapq.heappush(self.ready_heap, (ready_at, host))
+        self.scheduled_hosts.add(host)
+        self.has_work.notify()
+
+    def _enqueue(self, url, depth=0):
+        host = self.get_host(url)
+        with self.lock:
+            heapq.heappush(
+                self.host_queues.setdefault(host, list()),
+                (self.scorer(self, url, depth), next(self.sequence),
+                 url, depth))
+            self._schedule(host, time.time())
+
+    def _retire(self, url):
+        # url of a dropped trap template: completed without being fetched
+        self.save[get_urlhash(url)] = (url, True)
+        METRICS.inc("crawler_trap_urls_total", action=DROP)
+
+    def _retire_queued(self, url):
+        # the same for a url taken out of a host queue
+        self._retire(url)
+
+    def _pop_url(self, host):
+        # Best (url, depth) of host, skipping urls whose template was
+        # dropped after they were queued. None if none of them is left.
+        queue = self.host_queues[host]
+        entry = None
+        while queue:
+            _, _, url, depth = heapq.heappop(queue)
+            if self.traps.verdict(url) != DROP:
+                entry = url, depth
+                break
+            self._retire_queued(url)
+        if not queue:
+            del self.host_queues[host]
+        return entry
 
     def get_tbd_url(self):
-        try:
-            return self.to_be_downloaded.pop()
-        except IndexError:
-            return None
+        # Blocks until some host is due. Returns None only when there is
+        # nothing queued and no other worker holds a host that could still
+        # produce new urls, or once the crawl is stopping.
+        with self.lock:
+            while True:
+                if self.stopping:
+                    return None
+                if self.paused:
+                    self.has_work.wait()
+                    continue
+                now = time.time()
+                if self.ready_heap and self.ready_heap[0][0] <= now:
+                    _, host = heapq.heappop(self.ready_heap)
+                    self.scheduled_hosts.discard(host)
+                    entry = self._pop_url(host)
+                    if entry is None:
+                        continue
+                    url, depth = entry
+                    self.busy_hosts[host] = url
+                    self.in_flight[url] = depth
+                    return url
+                if self.ready_heap:
+                    self.has_work.wait(self.ready_heap[0][0] - now)
+                elif self.busy_hosts:
+                    self.has_work.wait()
+                else:
+                    # wake any other waiting worker so it can stop as well
+                    self.has_work.notify_all()
+                    return None
+
+    def host_delay(self, host):
+        # POLITENESS, or the host's robots.txt Crawl-delay if that is longer
+        if self.policies is None:
+            return self.config.time_delay
+        return max(self.config.time_delay, self.policies.crawl_delay(host))
+
+    def wait_for_host(self, url):
+        # Blocks until url's host may be contacted again, and books that
+        # contact: fetches made while a host is checked out (robots.txt,
+        # sitemaps, then the page) are host_delay apart as well. Hosts of
+        # other workers' checkouts are booked the same way.
+        host = self.get_host(url)
+        with self.lock:
+            now = time.time()
+            ready_at = max(
+                now, self.last_contact.get(host, 0) + self.host_delay(host))
+            self.last_contact[host] = ready_at
+        if ready_at > now:
+            time.sleep(ready_at - now)
+
+    def _release_host(self, url):
+        # Called when a worker is done with url: the host becomes due again
+        # POLITENESS seconds from now.
+        host = self.get_host(url)
+        with self.lock:
+            if self.busy_hosts.get(host) != url:
+                return
+            del self.busy_hosts[host]
+            self.in_flight.pop(url, None)
+            now = time.time()
+            self.next_allowed[host] = now + self.host_delay(host)
+            self._schedule(host, now)
+            if not self.busy_hosts and not self.ready_heap:
+                self.has_work.notify_all()
+
+    def depth_of(self, parent):
+        # depth of the urls found on parent; seeds have depth 0
+        if parent is None:
+            return 0
+        return self.in_flight.get(parent, 0) + 1
+
+    def add_url(self, url, parent=None):
+        # True if url was new and queued to be downloaded. parent is the
+        # url it was found on.
+        return self._add_url(url, self.depth_of(parent))
 
-    def add_url(self, url):
+    def _add_url(self, url, depth):
+        if self.config.max_depth and depth > self.config.max_depth:
+            # not marked seen: it may still be found closer to a seed
+            METRICS.inc("crawler_too_deep_total")
+            return False
         url = normalize(url)
         urlhash = get_urlhash(url)
-        if urlhash not in self.save:
-            self.save[urlhash] = (url, False)
-            self.save.sync()
-            self.to_be_downloaded.append(url)
+        with self.lock:
+            if not self.seen.add(self.seen_digest(urlhash)):
+                return False
+            verdict = self.traps.verdict(url)
+            if verdict == DROP:
+                self._retire(url)
+                return False
+            if self.policies and not self.policies.allows_cached(url):
+                self.save[urlhash] = (url, True)
+                METRICS.inc("crawler_robots_disallowed_total")
+                return False
+            if verdict == DEMOTE:
+                METRICS.inc("crawler_trap_urls_total", action=DEMOTE)
+            self.save[urlhash] = (url, False, {"depth": depth})
+            self._enqueue(url, depth)
+            return True
+
+    def record_visit(self, url, resp):
+        # Remembers what url's response looked like, to be saved when it is
+        # completed. False if it is unchanged since the last visit.
+        state = page_state(resp)
+        urlhash = get_urlhash(url)
+        with self.lock:
+            try:
+                record = self.save[urlhash]
+            except KeyError:
+                record = (url, False)
+            previous = record[2] if len(record) > 2 and record[2] else dict()
+            info, changed = self.revisits.update(previous, state, time.time())
+            info["depth"] = self.in_flight.get(url, previous.get("depth", 0))
+            self.visited[url] = info
+        return changed
+
+    def record_yield(self, url, new_urls):
+        # url was fetched and added new_urls never-seen urls.
+        with self.lock:
+            self.traps.record(url, new_urls)
     
+    def defer(self, url):
+        # url's host cannot be crawled yet (robots.txt unreachable): when
+        # the worker completes it, it is queued again instead, at most
+        # ROBOTS_RETRIES times. False once it is out of retries.
+        with self.lock:
+            count = self.deferrals.get(url, 0)
+            if count >= self.config.robots_retries:
+                self.deferrals.pop(url, None)
+                return False
+            self.deferrals[url] = count + 1
+            self.deferring.add(url)
+            return True
+
     def mark_url_complete(self, url):
         urlhash = get_urlhash(url)
-        if urlhash not in self.save:
-            # This should not happen.
-            self.logger.error(
-                f"Completed url {url}, but have not seen it before.")
+        with self.lock:
+            if url in self.deferring:
+                # still pending in the save file; queued again once its
+                # host is released (and due after the host's delay)
+                self.deferring.discard(url)
+                depth = self.in_flight.get(url, 0)
+                self._release_host(url)
+                self._enqueue(url, depth)
+                return
+            self.deferrals.pop(url, None)
+            if self.seen_digest(urlhash) not in self.seen:
+                # This should not happen.
+                self.logger.error(
+                    f"Completed url {url}, but have not seen it before.")
+
+            info = self.visited.pop(url, None)
+            self.save[urlhash] = (url, True, info) if info else (url, True)
+        self._release_host(url)
+
+    def checkpoint(self):
+        # Persist the write-behind batch, the seen set and the trap
+        # statistics; a resume from here loses nothing.
+        with self.lock:
+            self.save.flush()
+            self.seen.save(self.seen_file)
+            self.save.set_meta("seen_count", len(self.seen))
+            self.save.set_meta("trap_templates", self.traps.to_dict())
 
-        self.save[urlhash] = (url, True)
-        self.save.sync()
+    def close(self):
+        with self.lock:
+            self.checkpoint()
+            for template, verdict, stats in self.traps.flagged():
+                self.logger.info(
+                    f"Trap template {template}: {verdict}, {stats.pages} "
+                    f"pages, {stats.yield_rate:.2f} new urls per page.")
+            self.save.close()
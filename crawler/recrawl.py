@@ -0,0 +1,80 @@
+from hashlib import blake2b
+
+# What is remembered about a fetched page, in the info dict of its
+# completed frontier record:
+#   status, etag, last_modified, hash   of the last response
+#   fetched                             when it was last downloaded
+#   interval                            seconds until it is due again
+#   visits, changes                     downloads, and how many changed it
+# The interval adapts to the observed change rate: halved every time the
+# page changed since the last visit, doubled every time it did not.
+
+
+def page_state(resp):
+    # status, validators and body hash of a Response that is about to be
+    # parsed (so unpickling it costs nothing extra)
+    state = {"status": resp.status, "etag": None, "last_modified": None,
+             "hash": None}
+    raw = resp.raw_response if not resp.skipped else None
+    if raw is None:
+        return state
+    state["etag"] = resp.header("ETag")
+    state["last_modified"] = resp.header("Last-Modified")
+    if resp.status == 200 and raw.content is not None:
+        state["hash"] = blake2b(raw.content, digest_size=16).hexdigest()
+    return state
+
+
+def changed(previous, state):
+    # True unless state is the same page as previously seen. Bodies are
+    # compared by hash; the validators only decide when a body is missing
+    # (skipped unread).
+    if "fetched" not in previous:
+        return True
+    if previous.get("status") != state["status"]:
+        return True
+    if previous.get("hash") and state["hash"]:
+        return previous["hash"] != state["hash"]
+    for validator in ("etag", "last_modified"):
+        if previous.get(validator) and state[validator]:
+            return previous[validator] != state[validator]
+    return bool(previous.get("hash") or state["hash"])
+
+
+class RevisitPolicy(object):
+    ''' Decides when a fetched page is due again (see above). New pages
+    start at interval seconds; intervals stay within min_interval and
+    max_interval. '''
+
+    def __init__(self, interval, min_interval, max_interval):
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config.recrawl_interval, config.recrawl_min_interval,
+            config.recrawl_max_interval)
+
+    def update(self, previous, state, now):
+        # The info to save after a visit, and whether the page changed.
+        is_changed = changed(previous, state)
+        if "fetched" not in previous:
+            interval = self.interval
+        elif is_changed:
+            interval = max(self.min_interval, previous["interval"] / 2)
+        else:
+            interval = min(self.max_interval, previous["interval"] * 2)
+        info = dict(previous)
+        info.update(state)
+        info["fetched"] = now
+        info["interval"] = interval
+        info["visits"] = previous.get("visits", 0) + 1
+        info["changes"] = (
+            previous.get("changes", 0)
+            + (1 if is_changed and "fetched" in previous else 0))
+        return info, is_changed
+
+    def due(self, info, now):
+        return "fetched" in info and info["fetched"] + info["interval"] <= now
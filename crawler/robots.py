@@ -0,0 +1,179 @@
+import io
+import time
+
+from collections import OrderedDict
+from threading import Lock
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+from xml.etree.ElementTree import iterparse, ParseError
+
+
+class HostPolicy(object):
+    ''' The parsed robots.txt of one host, kept for ttl seconds.
+
+    An unreachable robots.txt (server error, or the cache server could not
+    get it) disallows everything until it is fetched again; its crawl
+    delay is the whole ttl, so the host is not contacted before then. '''
+
+    def __init__(self, host, user_agent, parser, sitemaps, max_delay, ttl,
+                 unreachable=False):
+        self.host = host
+        self.user_agent = user_agent
+        self.parser = parser
+        self.sitemaps = sitemaps
+        self.ttl = ttl
+        self.unreachable = unreachable
+        if unreachable:
+            self.crawl_delay = ttl
+        else:
+            delay = parser.crawl_delay(user_agent)
+            self.crawl_delay = min(float(delay or 0), max_delay)
+        self.fetched_at = time.monotonic()
+
+    def allowed(self, url):
+        return self.parser.can_fetch(self.user_agent, url)
+
+
+def parse_robots(host, user_agent, resp, max_delay, ttl=86400,
+                 retry_ttl=600):
+    # As in RFC 9309: a robots.txt that is missing (4xx) allows
+    # everything; one that is unreachable (5xx, or 6xx from the cache
+    # server) disallows everything, for retry_ttl seconds only.
+    parser = RobotFileParser()
+    sitemaps = list()
+    if resp.status >= 500:
+        parser.disallow_all = True
+        return HostPolicy(
+            host, user_agent, parser, sitemaps, max_delay, retry_ttl,
+            unreachable=True)
+    if resp.status == 200 and resp.raw_response is not None:
+        text = (resp.raw_response.content or b"").decode("utf-8", "replace")
+        parser.parse(text.splitlines())
+        sitemaps = parser.site_maps() or list()
+    else:
+        parser.allow_all = True
+    return HostPolicy(host, user_agent, parser, sitemaps, max_delay, ttl)
+
+
+def iter_sitemap(content):
+    ''' Streams ("url", loc) and ("sitemap", loc) pairs out of a sitemap or
+    sitemap index, clearing every entry once it is read. '''
+    stack = list()
+    try:
+        for event, element in iterparse(
+                io.BytesIO(content), events=("start", "end")):
+            tag = element.tag.rsplit("}", 1)[-1]
+            if event == "start":
+                stack.append(tag)
+                continue
+            stack.pop()
+            if tag == "loc" and stack and stack[-1] in ("url", "sitemap"):
+                loc = (element.text or "").strip()
+                if loc:
+                    yield stack[-1], loc
+            elif tag in ("url", "sitemap"):
+                element.clear()
+    except ParseError:
+        return
+
+
+class PolicyStore(object):
+    ''' robots.txt policies by host, fetched through the cache server.
+
+    Policies are kept for ttl seconds (retry_ttl if robots.txt was
+    unreachable) and at most capacity hosts (least recently used first
+    out). get() fetches a missing or expired policy; the scheduler only
+    ever reads what is cached, so it never waits on the network. '''
+
+    def __init__(self, user_agent, ttl=86400, capacity=1024, max_delay=10.0,
+                 retry_ttl=600):
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.retry_ttl = retry_ttl
+        self.capacity = capacity
+        self.max_delay = max_delay
+        self.lock = Lock()
+        self.policies = OrderedDict()
+        self.host_locks = dict()
+        self.known_hosts = set()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config.user_agent, config.robots_ttl, config.robots_cache_size,
+            config.max_crawl_delay, config.robots_retry_ttl)
+
+    def _cached(self, host):
+        with self.lock:
+            policy = self.policies.get(host)
+            if policy is None:
+                return None
+            if time.monotonic() - policy.fetched_at > policy.ttl:
+                del self.policies[host]
+                return None
+            self.policies.move_to_end(host)
+            return policy
+
+    def get(self, url, fetch):
+        # (policy, first): first is True the first time host's robots.txt
+        # is read in this process. fetch(url) returns a
+        # utils.response.Response.
+        parsed = urlparse(url)
+        host = parsed.hostname or ""
+        policy = self._cached(host)
+        if policy is not None:
+            return policy, False
+        with self.lock:
+            host_lock = self.host_locks.setdefault(host, Lock())
+        with host_lock:
+            policy = self._cached(host)
+            if policy is not None:
+                return policy, False
+            policy = parse_robots(
+                host, self.user_agent,
+                fetch(f"{parsed.scheme}://{parsed.netloc}/robots.txt"),
+                self.max_delay, self.ttl, self.retry_ttl)
+            with self.lock:
+                self.policies[host] = policy
+                while len(self.policies) > self.capacity:
+                    self.policies.popitem(last=False)
+                first = (
+                    not policy.unreachable and host not in self.known_hosts)
+                if not policy.unreachable:
+                    self.known_hosts.add(host)
+                self.host_locks.pop(host, None)
+        return policy, first
+
+    def allows_cached(self, url):
+        # False only if a cached policy disallows url (an unreachable
+        # robots.txt only postpones it)
+        policy = self._cached(urlparse(url).hostname or "")
+        return policy is None or policy.unreachable or policy.allowed(url)
+
+    def crawl_delay(self, host):
+        policy = self._cached(host)
+        return policy.crawl_delay if policy is not None else 0.0
+
+    def sitemap_urls(self, url, policy, fetch, max_urls=5000, max_files=10):
+        # Page urls from the sitemaps in policy (or /sitemap.xml of url's
+        # site if it names none), following sitemap indexes breadth first.
+        parsed = urlparse(url)
+        pending = list(policy.sitemaps) or [
+            f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"]
+        fetched, found = set(), 0
+        while pending and len(fetched) < max_files:
+            sitemap = pending.pop(0)
+            if sitemap in fetched:
+                continue
+            fetched.add(sitemap)
+            resp = fetch(sitemap)
+            if resp.status != 200 or resp.raw_response is None:
+                continue
+            for kind, loc in iter_sitemap(resp.raw_response.content or b""):
+                if kind == "sitemap":
+                    pending.append(loc)
+                    continue
+                yield loc
+                found += 1
+                if found >= max_urls:
+                    return
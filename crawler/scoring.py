@@ -0,0 +1,58 @@
+import math
+
+from crawler.traps import DEMOTE
+
+# Each scorer maps (frontier, url, depth) to a number; the frontier crawls
+# the url with the lowest weighted sum first within each host, and urls
+# with equal scores in the order they were found.
+
+
+def depth_score(frontier, url, depth):
+    # links from the seeds before links from their children
+    return depth
+
+
+def novelty_score(frontier, url, depth):
+    # templates already crawled a lot after fresh ones
+    stats = frontier.traps.stats(url)
+    return math.log1p(stats.pages) if stats else 0.0
+
+
+def trap_score(frontier, url, depth):
+    # demoted trap templates last
+    return 1 if frontier.traps.verdict(url) == DEMOTE else 0
+
+
+SCORERS = {
+    "depth": depth_score,
+    "novelty": novelty_score,
+    "trap": trap_score,
+}
+
+
+class Scorer(object):
+    ''' Weighted sum of SCORERS, configured as PRIORITY = name:weight,...
+    (e.g. depth:1,novelty:0.5,trap:100). '''
+
+    def __init__(self, weights):
+        for name in weights:
+            assert name in SCORERS, (
+                f"Unknown PRIORITY scorer {name}, "
+                f"expected one of {', '.join(SCORERS)}")
+        self.weights = [
+            (SCORERS[name], weight) for name, weight in weights.items()
+            if weight]
+
+    @classmethod
+    def parse(cls, spec):
+        weights = dict()
+        for item in spec.split(","):
+            if item.strip():
+                name, _, weight = item.partition(":")
+                weights[name.strip().lower()] = float(weight or 1)
+        return cls(weights)
+
+    def __call__(self, frontier, url, depth):
+        return sum(
+            weight * scorer(frontier, url, depth)
+            for scorer, weight in self.weights)
@@ -0,0 +1,180 @@
+import os
+import time
+import signal
+import zlib
+import multiprocessing
+
+from copy import copy
+from threading import Thread
+from urllib.parse import urlparse
+
+from utils import get_logger, shutdown_logging
+from utils.analytics import merge_reports
+from crawler.frontier import Frontier
+
+
+def shard_of(url, shard_count):
+    # Hosts are owned by exactly one shard, so politeness stays local.
+    host = urlparse(url).hostname or ""
+    return zlib.crc32(host.encode("utf-8")) % shard_count
+
+
+def shard_path(path, shard):
+    # data_report.txt -> data_report.shard0.txt
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard{shard}{ext}"
+
+
+class ShardedFrontier(Frontier):
+    ''' Frontier of one shard process.
+
+    Urls whose host belongs to another shard are forwarded to that
+    shard's inbox. outstanding is shared by all shards and counts urls
+    that are queued, being crawled, or in transit between shards; a shard
+    only stops once it reaches zero. When the crawl is stopped early,
+    drained (a barrier of all shards) keeps every shard receiving until
+    no worker of any shard can forward urls any more. '''
+
+    def __init__(self, config, restart, shard, inboxes, outstanding,
+                 drained=None):
+        self.shard = shard
+        self.inboxes = inboxes
+        self.outstanding = outstanding
+        self.drained = drained
+        super().__init__(config, restart)
+        self.receiver = Thread(target=self._receive, daemon=True)
+        self.receiver.start()
+
+    def _count(self, delta):
+        with self.outstanding.get_lock():
+            self.outstanding.value += delta
+
+    def _receive(self):
+        inbox = self.inboxes[self.shard]
+        while True:
+            item = inbox.get()
+            if item is None:
+                break
+            url, depth = item
+            super()._add_url(url, depth)
+            self._count(-1)
+
+    def _enqueue(self, url, depth=0):
+        self._count(1)
+        super()._enqueue(url, depth)
+
+    def _retire_queued(self, url):
+        super()._retire_queued(url)
+        self._count(-1)
+
+    def add_url(self, url, parent=None):
+        owner = shard_of(url, len(self.inboxes))
+        if owner == self.shard:
+            return super().add_url(url, parent)
+        # forwarded urls count as new for the trap detector: only the
+        # owning shard knows whether they were
+        self._count(1)
+        self.inboxes[owner].put((url, self.depth_of(parent)))
+        return True
+
+    def mark_url_complete(self, url):
+        super().mark_url_complete(url)
+        self._count(-1)
+
+    def get_tbd_url(self):
+        while True:
+            url = super().get_tbd_url()
+            if (url is not None or self.outstanding.value == 0
+                    or self.stopping):
+                return url
+            # another shard may still forward urls to this one
+            time.sleep(0.1)
+
+    def close(self):
+        if self.drained is not None:
+            self.drained.wait()
+        self.inboxes[self.shard].put(None)
+        self.receiver.join()
+        super().close()
+
+
+def run_shard(config, restart, shard, inboxes, outstanding, ready, drained):
+    # imported here so each process sets up its own scraper state
+    from crawler import Crawler
+    crawler = Crawler(
+        config, restart,
+        frontier_factory=lambda config, restart: ShardedFrontier(
+            config, restart, shard, inboxes, outstanding, drained))
+    # every shard must have loaded its pending urls (and counted them)
+    # before any shard may conclude the crawl is over
+    ready.wait()
+    crawler.start()
+    # multiprocessing children skip atexit: write out the queued log lines
+    shutdown_logging()
+
+
+class ShardedCrawler(object):
+    ''' Runs PROCESSCOUNT crawler processes, each owning the hosts that
+    hash to it with its own save file, analytics partial and worker
+    threads, then merges the partials into DATA_REPORT. Signals sent to
+    this process are passed on to every shard (see Crawler). '''
+
+    def __init__(self, config, restart):
+        self.config = config
+        self.restart = restart
+        self.logger = get_logger("CRAWLER")
+        self.processes = list()
+        self.pid = os.getpid()
+
+    def handle_signal(self, signum, frame):
+        # shards forked before they set their own handlers inherit this one
+        if os.getpid() != self.pid:
+            return
+        for process in self.processes:
+            if process.pid is not None and process.is_alive():
+                os.kill(process.pid, signum)
+
+    def install_signal_handlers(self):
+        for name in ("SIGINT", "SIGTERM", "SIGUSR1", "SIGUSR2"):
+            if hasattr(signal, name):
+                signal.signal(getattr(signal, name), self.handle_signal)
+
+    def shard_config(self, shard):
+        config = copy(self.config)
+        config.save_file = shard_path(self.config.save_file, shard)
+        config.data_report = shard_path(self.config.data_report, shard)
+        if self.config.metrics_port:
+            config.metrics_port = self.config.metrics_port + shard
+        return config
+
+    def start_async(self):
+        count = self.config.process_count
+        inboxes = [multiprocessing.Queue() for _ in range(count)]
+        outstanding = multiprocessing.Value("q", 0)
+        ready = multiprocessing.Barrier(count)
+        drained = multiprocessing.Barrier(count)
+        self.processes = [
+            multiprocessing.Process(
+                target=run_shard, name=f"Shard-{shard}",
+                args=(self.shard_config(shard), self.restart, shard,
+                      inboxes, outstanding, ready, drained))
+            for shard in range(count)]
+        for process in self.processes:
+            process.start()
+
+    def start(self):
+        self.install_signal_handlers()
+        self.start_async()
+        self.join()
+
+    def join(self):
+        for process in self.processes:
+            process.join()
+        reports = [
+            self.shard_config(shard).data_report
+            for shard in range(self.config.process_count)]
+        merge_reports(
+            reports, self.config.data_report, self.config.report_format)
+        self.logger.info(
+            f"Merged {len(reports)} shard reports into "
+            f"{self.config.data_report}.")
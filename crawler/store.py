@@ -0,0 +1,348 @@
+import os
+import json
+import time
+import shelve
+import sqlite3
+
+from threading import RLock
+
+from utils.metrics import METRICS
+
+
+class FrontierStore(object):
+    ''' Write-behind store of frontier records keyed by url hash.
+
+    Writes are buffered in memory and persisted as one batch once
+    flush_count records are dirty or flush_interval seconds have passed
+    since the last flush, so a crash loses at most one batch. Reads see
+    the buffered records. Besides the records, every backend keeps an
+    index of the pending (not completed) records so a resume does not
+    have to scan everything, and a small metadata map. Subclasses
+    implement the underscore primitives for one backend. '''
+
+    def __init__(self, path, flush_count=100, flush_interval=5.0):
+        self.path = path
+        self.flush_count = max(1, flush_count)
+        self.flush_interval = flush_interval
+        self.lock = RLock()
+        self.dirty = dict()
+        self.last_flush = time.time()
+
+    @classmethod
+    def files(cls, path):
+        return [path]
+
+    @classmethod
+    def exists(cls, path):
+        return any(os.path.exists(name) for name in cls.files(path))
+
+    @classmethod
+    def remove(cls, path):
+        for name in cls.files(path):
+            if os.path.exists(name):
+                os.remove(name)
+
+    def __contains__(self, urlhash):
+        with self.lock:
+            return urlhash in self.dirty or self._contains(urlhash)
+
+    def __getitem__(self, urlhash):
+        with self.lock:
+            if urlhash in self.dirty:
+                return self.dirty[urlhash]
+            return self._get(urlhash)
+
+    def __setitem__(self, urlhash, record):
+        with self.lock:
+            self.dirty[urlhash] = record
+            if (len(self.dirty) >= self.flush_count
+                    or time.time() - self.last_flush >= self.flush_interval):
+                self.flush()
+
+    def __len__(self):
+        with self.lock:
+            return self._len() + sum(
+                1 for urlhash in self.dirty if not self._contains(urlhash))
+
+    def values(self):
+        with self.lock:
+            self.flush()
+            return list(self._values())
+
+    def keys(self):
+        # Generator over every url hash; only used while nothing else
+        # touches the store (startup).
+        self.flush()
+        return self._keys()
+
+    def pending(self):
+        # Records that are not completed yet, read from the pending index.
+        with self.lock:
+            self.flush()
+            return list(self._pending())
+
+    def get_meta(self, key, default=None):
+        with self.lock:
+            return self._get_meta(key, default)
+
+    def set_meta(self, key, value):
+        with self.lock:
+            self._set_meta(key, value)
+
+    def flush(self):
+        with self.lock:
+            if self.dirty:
+                with METRICS.time("persistence"):
+                    self._write(self.dirty)
+                self.dirty = dict()
+            self.last_flush = time.time()
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            self._close()
+
+
+class ShelveStore(FrontierStore):
+    ''' The original shelve save file, synced once per batch, with the
+    pending index and metadata in two side shelves. '''
+
+    def __init__(self, path, flush_count=100, flush_interval=5.0):
+        super().__init__(path, flush_count, flush_interval)
+        self.db = shelve.open(path)
+        self.pending_db = shelve.open(path + ".pending")
+        self.meta_db = shelve.open(path + ".meta")
+        if not self.meta_db.get("pending_index", False):
+            # Save file from before the pending index: build it once.
+            for urlhash, record in self.db.items():
+                if not record[1]:
+                    self.pending_db[urlhash] = record
+            self.pending_db.sync()
+            self._set_meta("pending_index", True)
+
+    @classmethod
+    def files(cls, path):
+        # dbm backends add their own suffixes to the file name.
+        return [
+            name + suffix
+            for name in (path, path + ".pending", path + ".meta")
+            for suffix in ("", ".db", ".dir", ".dat", ".bak")]
+
+    def _contains(self, urlhash):
+        return urlhash in self.db
+
+    def _get(self, urlhash):
+        return self.db[urlhash]
+
+    def _len(self):
+        return len(self.db)
+
+    def _keys(self):
+        return iter(self.db.keys())
+
+    def _values(self):
+        return self.db.values()
+
+    def _pending(self):
+        return self.pending_db.values()
+
+    def _get_meta(self, key, default):
+        return self.meta_db.get(key, default)
+
+    def _set_meta(self, key, value):
+        self.meta_db[key] = value
+        self.meta_db.sync()
+
+    def _write(self, records):
+        for urlhash, record in records.items():
+            self.db[urlhash] = record
+            if record[1]:
+                self.pending_db.pop(urlhash, None)
+            else:
+                self.pending_db[urlhash] = record
+        self.db.sync()
+        self.pending_db.sync()
+
+    def _close(self):
+        self.db.close()
+        self.pending_db.close()
+        self.meta_db.close()
+
+
+class SQLiteStore(FrontierStore):
+    ''' SQLite in WAL mode; every batch is one transaction. Pending
+    records are mirrored in their own table. '''
+
+    def __init__(self, path, flush_count=100, flush_interval=5.0):
+        super().__init__(path, flush_count, flush_interval)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "urlhash TEXT PRIMARY KEY, record TEXT NOT NULL)")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS pending ("
+            "urlhash TEXT PRIMARY KEY, record TEXT NOT NULL)")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS meta ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.db.commit()
+        if not self._get_meta("pending_index", False):
+            # Save file from before the pending index: build it once.
+            with self.db:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO pending (urlhash, record) "
+                    "SELECT urlhash, record FROM urls "
+                    "WHERE json_extract(record, '$[1]') = 0")
+            self._set_meta("pending_index", True)
+
+    @classmethod
+    def files(cls, path):
+        return [path, path + "-wal", path + "-shm"]
+
+    def _contains(self, urlhash):
+        return self.db.execute(
+            "SELECT 1 FROM urls WHERE urlhash = ?", (urlhash,)
+        ).fetchone() is not None
+
+    def _get(self, urlhash):
+        row = self.db.execute(
+            "SELECT record FROM urls WHERE urlhash = ?", (urlhash,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(urlhash)
+        return tuple(json.loads(row[0]))
+
+    def _len(self):
+        return self.db.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+
+    def _keys(self):
+        for (urlhash,) in self.db.execute("SELECT urlhash FROM urls"):
+            yield urlhash
+
+    def _values(self):
+        for (record,) in self.db.execute("SELECT record FROM urls"):
+            yield tuple(json.loads(record))
+
+    def _pending(self):
+        for (record,) in self.db.execute("SELECT record FROM pending"):
+            yield tuple(json.loads(record))
+
+    def _get_meta(self, key, default):
+        row = self.db.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def _set_meta(self, key, value):
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                (key, json.dumps(value)))
+
+    def _write(self, records):
+        rows = [
+            (urlhash, json.dumps(record))
+            for urlhash, record in records.items()]
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO urls (urlhash, record) VALUES (?, ?)",
+                rows)
+            self.db.executemany(
+                "DELETE FROM pending WHERE urlhash = ?",
+                [(urlhash,) for urlhash, record in records.items()
+                 if record[1]])
+            self.db.executemany(
+                "INSERT OR REPLACE INTO pending (urlhash, record) "
+                "VALUES (?, ?)",
+                [row for row, record in zip(rows, records.values())
+                 if not record[1]])
+
+    def _close(self):
+        self.db.close()
+
+
+class AppendLogStore(FrontierStore):
+    ''' Append-only log of JSON lines, replayed into memory on open. The
+    pending index is kept in memory as a set of url hashes; metadata
+    entries are logged as [null, key, value]. '''
+
+    def __init__(self, path, flush_count=100, flush_interval=5.0):
+        super().__init__(path, flush_count, flush_interval)
+        self.records = dict()
+        self.pending_hashes = set()
+        self.meta = dict()
+        if os.path.exists(path):
+            with open(path) as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # torn last line from an interrupted batch
+                        break
+                    if entry[0] is None:
+                        self.meta[entry[1]] = entry[2]
+                    else:
+                        self._index(entry[0], tuple(entry[1]))
+        self.log = open(path, "a")
+
+    def _index(self, urlhash, record):
+        self.records[urlhash] = record
+        if record[1]:
+            self.pending_hashes.discard(urlhash)
+        else:
+            self.pending_hashes.add(urlhash)
+
+    def _contains(self, urlhash):
+        return urlhash in self.records
+
+    def _get(self, urlhash):
+        return self.records[urlhash]
+
+    def _len(self):
+        return len(self.records)
+
+    def _keys(self):
+        return iter(list(self.records))
+
+    def _values(self):
+        return self.records.values()
+
+    def _pending(self):
+        return [self.records[urlhash] for urlhash in self.pending_hashes]
+
+    def _get_meta(self, key, default):
+        return self.meta.get(key, default)
+
+    def _set_meta(self, key, value):
+        self._append([[None, key, value]])
+        self.meta[key] = value
+
+    def _append(self, entries):
+        self.log.writelines(json.dumps(entry) + "\n" for entry in entries)
+        self.log.flush()
+        os.fsync(self.log.fileno())
+
+    def _write(self, records):
+        self._append([urlhash, record] for urlhash, record in records.items())
+        for urlhash, record in records.items():
+            self._index(urlhash, record)
+
+    def _close(self):
+        self.log.close()
+
+
+STORES = {
+    "shelve": ShelveStore,
+    "sqlite": SQLiteStore,
+    "log": AppendLogStore,
+}
+
+
+def get_store_class(config):
+    try:
+        return STORES[config.store_backend]
+    except KeyError:
+        raise ValueError(
+            f"Unknown STORE {config.store_backend!r}, "
+            f"expected one of {', '.join(STORES)}.")
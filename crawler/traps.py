@@ -0,0 +1,100 @@
+import re
+
+from functools import lru_cache
+from urllib.parse import urlparse, parse_qsl
+
+# what the frontier does with a url of a given template
+KEEP, DEMOTE, DROP = "keep", "demote", "drop"
+
+# path segments that are opaque ids: long hex strings or long tokens
+ID_SEGMENT = re.compile(r"[0-9a-fA-F]{12,}|[A-Za-z0-9_\-]{32,}")
+NUMBER = re.compile(r"\d+")
+
+
+@lru_cache(maxsize=1 << 16)
+def template_of(url):
+    ''' Groups urls that only differ in numbers, ids and query values:
+    https://h/events/2019-01-05/?a=1&b=2 -> h/events/<n>-<n>-<n>?a&b '''
+    parsed = urlparse(url)
+    shape = "/".join(
+        "<id>" if ID_SEGMENT.fullmatch(segment) else
+        NUMBER.sub("<n>", segment)
+        for segment in parsed.path.rstrip("/").split("/"))
+    keys = sorted({key for key, _ in parse_qsl(
+        parsed.query, keep_blank_values=True)})
+    return f"{(parsed.hostname or '')}{shape}?{'&'.join(keys)}"
+
+
+class TemplateStats(object):
+    __slots__ = ("pages", "new_urls", "yield_rate")
+
+    def __init__(self, pages=0, new_urls=0, yield_rate=None):
+        self.pages = pages
+        self.new_urls = new_urls
+        # moving average of the new urls found per page
+        self.yield_rate = yield_rate
+
+
+class TrapDetector(object):
+    ''' Adaptive per-template crawl budgets.
+
+    Every fetched page reports how many never-seen urls it added. A
+    template whose recent pages bring fewer than min_yield new urls each
+    (once min_pages of them were fetched) is demoted: its urls get the
+    trap penalty of crawler/scoring.py. A template that has used up budget pages
+    is dropped: its remaining urls are retired without being fetched. '''
+
+    # weight of the newest page in the yield average
+    SMOOTHING = 0.1
+
+    def __init__(self, budget=2000, min_pages=20, min_yield=0.2):
+        self.budget = budget
+        self.min_pages = min_pages
+        self.min_yield = min_yield
+        self.templates = dict()
+
+    def _judge(self, stats):
+        if stats is None:
+            return KEEP
+        if self.budget and stats.pages >= self.budget:
+            return DROP
+        if (stats.pages >= self.min_pages
+                and stats.yield_rate < self.min_yield):
+            return DEMOTE
+        return KEEP
+
+    def stats(self, url):
+        return self.templates.get(template_of(url))
+
+    def verdict(self, url):
+        return self._judge(self.stats(url))
+
+    def record(self, url, new_urls):
+        template = template_of(url)
+        stats = self.templates.get(template)
+        if stats is None:
+            stats = self.templates[template] = TemplateStats()
+        stats.pages += 1
+        stats.new_urls += new_urls
+        if stats.yield_rate is None:
+            stats.yield_rate = float(new_urls)
+        else:
+            stats.yield_rate += self.SMOOTHING * (new_urls - stats.yield_rate)
+
+    def to_dict(self):
+        return {
+            template: [stats.pages, stats.new_urls, stats.yield_rate]
+            for template, stats in self.templates.items()}
+
+    def load(self, data):
+        # state saved with to_dict in the frontier store's meta
+        for template, (pages, new_urls, yield_rate) in (data or {}).items():
+            self.templates[template] = TemplateStats(
+                pages, new_urls, yield_rate)
+
+    def flagged(self):
+        # (template, verdict, stats) of every demoted or dropped template
+        for template, stats in self.templates.items():
+            verdict = self._judge(stats)
+            if verdict != KEEP:
+                yield template, verdict, stats
@@ -1,10 +1,21 @@
 from threading import Thread
 
+from functools import lru_cache
 from inspect import getsource
 from utils.download import download
 from utils import get_logger
+from utils.metrics import METRICS
+from utils.replay import get_recorder
 import scraper
-import time
+
+
+@lru_cache(maxsize=None)
+def check_scraper():
+    # basic check for requests in scraper; the source is read once per
+    # process, not once per worker
+    source = getsource(scraper)
+    assert {source.find(req) for req in {"from requests import", "import requests"}} == {-1}, "Do not use requests in scraper.py"
+    assert {source.find(req) for req in {"from urllib.request import", "import urllib.request"}} == {-1}, "Do not use urllib.request in scraper.py"
 
 
 class Worker(Thread):
@@ -12,23 +23,113 @@ class Worker(Thread):
         self.logger = get_logger(f"Worker-{worker_id}", "Worker")
         self.config = config
         self.frontier = frontier
-        # basic check for requests in scraper
-        assert {getsource(scraper).find(req) for req in {"from requests import", "import requests"}} == {-1}, "Do not use requests in scraper.py"
-        assert {getsource(scraper).find(req) for req in {"from urllib.request import", "import urllib.request"}} == {-1}, "Do not use urllib.request in scraper.py"
+        check_scraper()
         super().__init__(daemon=True)
         
     def run(self):
         while True:
             tbd_url = self.frontier.get_tbd_url()
             if not tbd_url:
-                self.logger.info("Frontier is empty. Stopping Crawler.")
+                self.logger.info(
+                    "Crawl stopped. Stopping worker." if self.frontier.stopping
+                    else "Frontier is empty. Stopping Crawler.")
                 break
-            resp = download(tbd_url, self.config, self.logger)
+            try:
+                if self.allowed(tbd_url):
+                    self.frontier.wait_for_host(tbd_url)
+                    with METRICS.time("fetch"):
+                        resp = download(tbd_url, self.config, self.logger)
+                    self.process(tbd_url, resp)
+            except Exception:
+                self.logger.exception(f"Failed to process {tbd_url}.")
+            # Politeness is enforced per host by the frontier, which makes
+            # this url's host due again POLITENESS seconds after completion.
+            self.frontier.mark_url_complete(tbd_url)
+
+    def fetch(self, url):
+        # download for robots.txt and sitemaps, recorded like pages and
+        # spaced like them
+        self.frontier.wait_for_host(url)
+        resp = download(url, self.config, self.logger)
+        if self.config.record_file:
+            get_recorder(self.config.record_file).record(url, resp)
+        return resp
+
+    def allowed(self, tbd_url):
+        # Checks tbd_url against its host's robots.txt, fetching it if it is
+        # not cached. The first time a host is seen, the urls of its
+        # sitemaps are added to the frontier.
+        policies = self.frontier.policies
+        if policies is None:
+            return True
+        with METRICS.time("robots"):
+            policy, first = policies.get(tbd_url, self.fetch)
+        if first and self.config.sitemaps:
+            added = 0
+            with METRICS.time("sitemap"):
+                for url in policies.sitemap_urls(
+                        tbd_url, policy, self.fetch,
+                        self.config.sitemap_max_urls):
+                    if scraper.is_valid(url) and self.frontier.add_url(url):
+                        added += 1
+            if added:
+                self.logger.info(
+                    f"Added {added} urls from the sitemaps of {policy.host}.")
+        if policy.unreachable:
+            METRICS.inc("crawler_robots_unreachable_total")
+            if self.frontier.defer(tbd_url):
+                self.logger.info(
+                    f"Deferred {tbd_url}: robots.txt of {policy.host} is "
+                    f"unreachable.",
+                    extra={"url": tbd_url, "reason": "robots_unreachable"})
+            else:
+                self.logger.warning(
+                    f"Skipped {tbd_url}: robots.txt of {policy.host} stayed "
+                    f"unreachable.",
+                    extra={"url": tbd_url, "reason": "robots_unreachable"})
+            return False
+        if policy.allowed(tbd_url):
+            return True
+        METRICS.inc("crawler_robots_disallowed_total")
+        self.logger.info(
+            f"Skipped {tbd_url}: disallowed by robots.txt.",
+            extra={"url": tbd_url, "reason": "robots"})
+        return False
+
+    def process(self, tbd_url, resp):
+        self.logger.info(
+            f"Downloaded {tbd_url}, status <{resp.status}>, "
+            f"using cache {self.config.cache_server}.",
+            extra={"url": tbd_url, "status": resp.status})
+        if self.config.record_file:
+            get_recorder(self.config.record_file).record(tbd_url, resp)
+        METRICS.inc("crawler_pages_total")
+        METRICS.inc("crawler_responses_total", status=resp.status)
+        METRICS.inc("crawler_bytes_total", resp.size)
+        # oversized and non-HTML bodies never reach the parser
+        reason = resp.skip_reason(
+            self.config.max_body_size, self.config.content_types)
+        if reason:
+            METRICS.inc("crawler_responses_skipped_total", reason=reason)
             self.logger.info(
-                f"Downloaded {tbd_url}, status <{resp.status}>, "
-                f"using cache {self.config.cache_server}.")
-            scraped_urls = scraper.scraper(tbd_url, resp)
+                f"Skipped {tbd_url}: {reason}.",
+                extra={"url": tbd_url, "reason": reason})
+            self.frontier.record_yield(tbd_url, 0)
+            return
+        # Only bodies the scraper parses are hashed and remembered for
+        # re-crawls; the same body as on the last visit has its words
+        # counted and its links queued already.
+        if resp.status == 200 and not self.frontier.record_visit(tbd_url, resp):
+            METRICS.inc("crawler_pages_unchanged_total")
+            self.logger.info(
+                f"Skipped {tbd_url}: unchanged since the last visit.",
+                extra={"url": tbd_url, "reason": "unchanged"})
+            return
+        scraped_urls = scraper.scraper(tbd_url, resp)
+        new_urls = 0
+        with METRICS.time("frontier_add"):
             for scraped_url in scraped_urls:
-                self.frontier.add_url(scraped_url)
-            self.frontier.mark_url_complete(tbd_url)
-            time.sleep(self.config.time_delay)
+                if self.frontier.add_url(scraped_url, tbd_url):
+                    new_urls += 1
+        # how many new urls this page brought, for the trap detector
+        self.frontier.record_yield(tbd_url, new_urls)
@@ -1,17 +1,35 @@
 from configparser import ConfigParser
 from argparse import ArgumentParser
 
-from utils.server_registration import get_cache_server
+from utils import configure_logging
 from utils.config import Config
 from crawler import Crawler
+from crawler.sharded import ShardedCrawler
 
 
-def main(config_file, restart):
+def main(config_file, restart, replay=None, record=None, recrawl=False):
     cparser = ConfigParser()
     cparser.read(config_file)
     config = Config(cparser)
-    config.cache_server = get_cache_server(config, restart)
-    crawler = Crawler(config, restart)
+    configure_logging(
+        config.log_level, config.log_sample, config.log_batch,
+        config.log_flush_interval)
+    config.record_file = record
+    if recrawl:
+        config.recrawl = True
+    if replay:
+        # Offline: serve a recorded crawl locally, skip registration.
+        from utils.replay import ReplayServer
+        server = ReplayServer.from_file(replay)
+        server.start()
+        config.cache_server = server.address
+    else:
+        from utils.server_registration import get_cache_server
+        config.cache_server = get_cache_server(config, restart)
+    if config.process_count > 1:
+        crawler = ShardedCrawler(config, restart)
+    else:
+        crawler = Crawler(config, restart)
     crawler.start()
 
 
@@ -19,5 +37,16 @@ if __name__ == "__main__":
     parser = ArgumentParser()
     parser.add_argument("--restart", action="store_true", default=False)
     parser.add_argument("--config_file", type=str, default="config.ini")
+    parser.add_argument(
+        "--replay", type=str, default=None,
+        help="crawl a recording through a local stand-in cache server")
+    parser.add_argument(
+        "--record", type=str, default=None,
+        help="append every downloaded response to this recording")
+    parser.add_argument(
+        "--recrawl", action="store_true", default=False,
+        help="resume and revisit the fetched pages that are due again")
     args = parser.parse_args()
-    main(args.config_file, args.restart)
+    main(
+        args.config_file, args.restart, args.replay, args.record,
+        args.recrawl)
@@ -1,23 +1,40 @@
+import heapq
 import json
 
+from utils.dumpfmt import ReportDump, is_dump
+
+
+def top_words(word_freqs, k, min_length=2):
+    # the k most frequent words of at least min_length letters, most
+    # frequent first, without sorting every word
+    return heapq.nlargest(
+        k,
+        ((word, count) for word, count in word_freqs.items()
+         if len(word) >= min_length),
+        key=lambda item: item[1])
+
+
 def process_data(filename: str) -> None:
-    with open(filename, 'r') as file:
-        data = json.load(file)
-    
-    unique_urls = data["unique_urls"]
-    longest_page = data["longest_page"]
-    # only top 50 common words
-    sorted_words = sorted(data["word_freqs"].items(), key=lambda item: item[1], reverse=True)
-    filtered_words = []
-
-    # filter out 1 letter "words"
-    for word in sorted_words:
-        if len(word[0]) > 1:
-            filtered_words.append(word)
-
-    filtered_words = filtered_words[:49]
-    sorted_subdomains = sorted(data["subdomains"].items())
-    num_subdomains = data["total_subdomains"]
+    if is_dump(filename):
+        # binary report: only the header, the count table and the winning
+        # words are paged in
+        with ReportDump(filename) as data:
+            unique_urls = data.unique_urls
+            longest_page = data.longest_page
+            # only top 50 common words, 1 letter "words" filtered out
+            filtered_words = data.top_words(49)
+            sorted_subdomains = sorted(data.subdomains().items())
+            num_subdomains = data.total_subdomains
+    else:
+        with open(filename, 'r') as file:
+            data = json.load(file)
+
+        unique_urls = data["unique_urls"]
+        longest_page = data["longest_page"]
+        # only top 50 common words, 1 letter "words" filtered out
+        filtered_words = top_words(data["word_freqs"], 49)
+        sorted_subdomains = sorted(data["subdomains"].items())
+        num_subdomains = data["total_subdomains"]
 
     with open("report.txt", 'w') as file:
         file.write(f"# unique pages: {unique_urls}\n")
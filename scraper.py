@@ -1,43 +1,59 @@
-import re
-import json
-import os
-from nltk.corpus import words as english
-from urllib.parse import urlparse, urlunparse, parse_qs, urlencode, urldefrag, urljoin
-from bs4 import BeautifulSoup
-from collections import defaultdict
-from stopwords import STOPWORDS
-
-# entire English dictionary
-ENGLISH_WORDS = set(english.words())
+from hashlib import sha256
+from inspect import getsource
+from urllib.parse import urljoin
+from utils.analytics import Analytics
+from utils.page import parse_page
+from utils.tokenizer import count_words
+from utils.seenset import SeenSet
+from utils import url_filter
+from utils.simhash import simhash, SimHashIndex
+from utils.metrics import METRICS
+from utils.canonical import canonicalize
+
+# compiled is_valid rules with a per-url cache
+URL_FILTER = url_filter.UrlFilter()
+
+# SimHash fingerprints of crawled pages, kept (and checkpointed) by the
+# analytics; pages within SIMHASH_DISTANCE bits of one already seen are
+# near-duplicates. Pages with fewer words than SIMHASH_MIN_WORDS are too
+# short to fingerprint reliably. Only the SIMHASH_MAX_PAGES most recent
+# fingerprints are kept.
+SIMHASH_DISTANCE = 3
+SIMHASH_MIN_WORDS = 50
+SIMHASH_MAX_PAGES = 1 << 18
 
 
 class SeenURL:
-    seen = {}
+    # urls already counted, as a compact digest set (shared with analytics)
+    seen = SeenSet()
+
+# crawl statistics, created by init_analytics (or lazily with defaults)
+ANALYTICS = None
 
-def remove_non_english_and_stopwords(words):
-    # return a list of valid English non-stopwords
-    return [word.lower() for word in words if word.lower() not in STOPWORDS and word in ENGLISH_WORDS]
 
+def init_analytics(report_file="data_report.txt", flush_every=50,
+                   snapshot_every=5000, restart=False, report_format="binary"):
+    global ANALYTICS
+    ANALYTICS = Analytics(
+        report_file, flush_every, snapshot_every, restart, report_format,
+        SimHashIndex(SIMHASH_DISTANCE, SIMHASH_MAX_PAGES))
+    SeenURL.seen = ANALYTICS.seen_urls
+    return ANALYTICS
 
-def init_data():
-    data = {
-    "seen_urls": {},
-    "unique_urls": 0,
-    "longest_page": ["NULL", -1],
-    "word_freqs": {},
-    "subdomains": {},
-    "total_subdomains": 0
-    }
 
-    with open("data_report.txt", 'w') as file:
-        json.dump(data, file)
+def get_analytics():
+    if ANALYTICS is None:
+        init_analytics()
+    return ANALYTICS
 
 
-def update_data(url, words):
-    # structure of data
+def update_data(url, words, fingerprint=None):
+    # record the page in the in-memory analytics; the store checkpoints
+    # itself to data_report.txt so the cost per page stays constant.
+    # structure of the checkpoint (seen urls are in data_report.txt.seen),
+    # written as JSON or as the binary dump of utils/dumpfmt.py
     #####################
     # {
-    # "seen_urls": dict{str: True},
     # "unique_urls": int,
     # "longest_page": tuple(str, int),
     # "word_freqs": dict{str: int},
@@ -45,198 +61,84 @@ def update_data(url, words):
     # "total_subdomains": int
     # }
     #####################
-
-    # if the file is empty, initialize it with default data
-    if os.stat("data_report.txt").st_size == 0:
-        init_data()
-
-    with open("data_report.txt", "r+") as file:
-        data = json.load(file)
-
-        # update unique URLs
-        # remove fragment from URL
-        url_minus_fragment = urldefrag(url)[0]
-
-        if url_minus_fragment not in data["seen_urls"]:
-            data["unique_urls"] += 1
-            data["seen_urls"][url_minus_fragment] = True
-        SeenURL.seen = data["seen_urls"]
-
-        # update longest page
-        # get word count
-        word_count = len(words)
-
-        # if word_count of current URL exceeds curr longest page, update the data
-        if word_count > data["longest_page"][1]:
-            data["longest_page"] = (url, word_count)
-
-        # update word frequencies
-        for word in words:
-            if word in data["word_freqs"]:
-                data["word_freqs"][word] += 1
-            else:
-                data["word_freqs"][word] = 1
-
-        # update subdomains
-        parsed = urlparse(url)
-        hostname = parsed.hostname
-
-        if not hostname:
-            return
-
-        elif hostname == "uci.edu" or hostname.endswith('.' + "uci.edu"):
-            # increment total subdomains if subdomain is new 
-            if hostname not in data["subdomains"]:
-                data["total_subdomains"] += 1
-            
-            # increment subdomain in subdomain dict
-            if hostname in data["subdomains"]:
-                data["subdomains"][hostname] += 1
-            else:
-                data["subdomains"][hostname] = 1
-        
-        file.seek(0)
-        json.dump(data, file)
-        file.truncate()
+    # False if the page is a near-duplicate of one already recorded (see
+    # Analytics.add_page).
+    return get_analytics().add_page(url, words, fingerprint)
 
 
 def combine_url(base_url, subdomain):
-    # join base url to subdomain url and remove any fragment(s)
-    return urldefrag(urljoin(base_url, subdomain))[0]
+    # join base url to subdomain url in canonical form (no fragment)
+    return canonicalize(urljoin(base_url, subdomain))
 
 
 def scraper(url, resp):
     if resp.status != 200 or not resp.raw_response:
         return []
 
-    links = extract_next_links(url, resp)
-
-    html = BeautifulSoup(resp.raw_response.content, 'html.parser')
-
-    # extract text (excluding HTML markup) from HTML
-    text = html.get_text(strip=True)
-    words = text.split()
-
-    # remove all non-English words and all stopwords from list of words
-    words = remove_non_english_and_stopwords(words)
-
-    res = [link for link in links if is_valid(link)]
+    # parse the page once for both its links and its visible text
+    with METRICS.time("parse"):
+        page = parse_page(url, resp.raw_response.content)
+
+    # extract text (excluding HTML markup) from HTML with text nodes joined
+    # by spaces, so words from adjacent tags stay apart, and count the
+    # English non-stopword tokens
+    with METRICS.time("tokenize"):
+        words = count_words(page.get_text(" "))
+
+    # update report data (the analytics store checkpoints to disk itself);
+    # a near-duplicate of a page already crawled (calendar views,
+    # revisions, session-id variants) has the url counted but not its
+    # words or links
+    fingerprint = None
+    if sum(words.values()) >= SIMHASH_MIN_WORDS:
+        fingerprint = simhash(words)
+    if not update_data(url, words, fingerprint):
+        return []
 
-    # update report data and write it to file (also grab list of seen URLs)
-    update_data(url, words)
+    res = list()
+    with METRICS.time("filter"):
+        for link in page.links:
+            reason = rejection_reason(link)
+            if reason is None:
+                res.append(link)
+            else:
+                METRICS.inc("crawler_links_rejected_total", rule=reason)
 
     return res
 
 
 def extract_next_links(url, resp):
-    html = BeautifulSoup(resp.raw_response.content, 'html.parser')
-    urls = []
-
-    for tag in html.find_all('a', href=True):
-        urls.append(combine_url(url, tag["href"]))
-
-    return urls
-
-
-# function not used currently, may be used later
-# def normalizeUrl(url):
-#     parsed = urlparse(url)
-#     query = parse_qs(parsed.query)
-
-#     allowedParams = ['id', 'category', 'search', 'query', 'tags']
-#     #lockedParams = ['do', 'rev', 'token', 'action', 'sid', 'user', 'access_token', 'diff', 'update', 'restore', 'sort', 'order']
-
-#     filteredQuery = {k: v for k, v in query.items() if k in allowedParams}
-#     #filteredQuery = {k: v for k, v in query.items() if k not in blockedParams}
-
-#     newQuery = urlencode(filteredQuery, doseq=True)
-#     return urlunparse(parsed._replace(query=newQuery))
-
-
-def is_path_date(split_path: list) -> bool:
-    #Checks if keywords for date are in the path.
-    pattern = r'\d{4}[-/.]?\d{2}[-/.]?\d{2}'
-    keywords = {"day", "month", "year", "date", "time"}
-    for part in split_path:
-        if (part.lower() in keywords): #Does Keywords check on the part of the path
-            return True
-        if (re.fullmatch(pattern, part)): #Does Number Pattern check on the part of the path
-            return True
-    return False
-
-
-def is_query_date(query: dict) -> bool:
-    #Checks if keywords for date are in the query.
-    pattern = r'\d{4}[-/.]?\d{2}[-/.]?\d{2}'
-    keywords = {"day", "month", "year", "date", "time"}
-    for pair in query.items():
-        if (pair[0].lower() in keywords):
-            return True
-        # pair[1] is a list of every query for the given keyword, will likely only be one item
-        for item in pair[1]:
-            if (re.fullmatch(pattern, item)):
-                return True
-    return False
+    return parse_page(url, resp.raw_response.content).links
 
 
 def is_valid(url):
     # Decide whether to crawl this url or not.
     # If you decide to crawl it, return True; otherwise return False.
-    # There are already some conditions that return False.
-    try:
-        #Contains fragment
-        if ("#" in url):
-            url = url.split("#")[0] #Split at where it fragments into a list and get first element
+    # The rules themselves live in utils/url_filter.py, compiled once.
+    return rejection_reason(url) is None
 
-        # moved fragment remover to normalizeUrl
-        parsed = urlparse(url)# Splits into 6 parts: Scheme, netloc, path, params, query, fragment
 
-        #Ex. Scheme="https", Netloc="www.helloworld.com", Path="/path/.../, Params="", query="query=int", Fragment="fragment" (Ignore)
+def rejection_reason(url):
+    # None if url should be crawled, otherwise the name of the rule that
+    # rejected it.
+    try:
+        # canonical form: no fragment, equivalent urls are one url
+        url = canonicalize(url)
 
         #Already Visited Website (No need to go back/potential infinite trap)
-        if (urlunparse(parsed) in SeenURL.seen): #kyle changed
-            return False
+        if (url in SeenURL.seen): #kyle changed
+            return "seen"
 
-        if parsed.scheme not in set(["http", "https"]):
-            return False
-
-        domains = ["ics.uci.edu", "cs.uci.edu", "informatics.uci.edu", "stat.uci.edu"]
-
-        # gitlab is evil
-        if parsed.hostname == "gitlab.ics.uci.edu":
-            return False
-
-        #Check to see if domain in netloc(subdomain + domain)
-        if not any(domain in parsed.netloc for domain in domains):
-            return False
-
-        #Special Link since it has more than netloc to check
-        if ("today.uci.edu" in parsed.netloc) and (parsed.path != "/department/information_computer_sciences/"):
-            return False
-        
-        split_path = parsed.path.split("/")
-        query_dict = parse_qs(parsed.query)
-
-        if (is_path_date(split_path) or is_query_date(query_dict)):
-            return False
-
-        if re.match(
-                r".*\.(css|js|bmp|gif|jpe?g|ico"
-                + r"|png|tiff?|mid|mp2|mp3|mp4"
-                + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
-                + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
-                + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso|img"
-                + r"|epub|dll|cnf|tgz|sha1"
-                + r"|thmx|mso|arff|rtf|jar|csv"
-                + r"|rm|smil|wmv|swf|wma|zip|rar|gz"
-                + r"|sql|apk|bat)$", parsed.path.lower()):
-            return False
-
-        #Restore back to link form (String)
-        parsed = urlunparse(parsed)
-
-        return True
+        return URL_FILTER.check(url)
 
     except TypeError:
-        print ("TypeError for ", parsed)
+        print ("TypeError for ", url)
         raise
+
+
+def rules_fingerprint():
+    # Hash of the url filter rules. The frontier stores it with its save
+    # file and only re-runs is_valid on pending urls when it changes.
+    return sha256(
+        (getsource(url_filter) + getsource(rejection_reason)).encode("utf-8")
+    ).hexdigest()
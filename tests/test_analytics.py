@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from collections import Counter
+
+from utils.analytics import Analytics
+from utils.simhash import simhash, SimHashIndex
+
+
+class RevisitTest(unittest.TestCase):
+    ''' A page fetched again by a re-crawl, with a changed body, must not
+    change the word totals. '''
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.report_file = os.path.join(self.dir, "data_report.txt")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def crawl(self, analytics):
+        analytics.add_page(
+            "https://www.ics.uci.edu/a", ["alpha"] * 3 + ["beta"] * 2)
+        analytics.add_page("https://www.ics.uci.edu/b", ["gamma"])
+        return analytics.to_dict()
+
+    def test_changed_page(self):
+        analytics = Analytics(self.report_file, restart=True)
+        before = self.crawl(analytics)
+        analytics.add_page("https://www.ics.uci.edu/a/", ["delta"] * 10)
+        self.assertEqual(analytics.to_dict(), before)
+        self.assertEqual(sum(analytics.word_freqs.values()), 6)
+
+    def test_changed_page_after_resume(self):
+        analytics = Analytics(self.report_file, restart=True)
+        before = self.crawl(analytics)
+        analytics.close()
+        analytics = Analytics(self.report_file)
+        analytics.add_page("https://www.ics.uci.edu/a", ["delta"] * 10)
+        analytics.flush()
+        self.assertEqual(analytics.to_dict(), before)
+        # and nothing is replayed on top of the snapshot
+        self.assertEqual(Analytics(self.report_file).to_dict(), before)
+
+
+class NearDuplicateResumeTest(unittest.TestCase):
+    ''' A near-duplicate of a page counted before a resume must still be
+    rejected after it. '''
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.report_file = os.path.join(self.dir, "data_report.txt")
+        self.page = Counter({f"word{i}": 1 + i % 5 for i in range(200)})
+        self.variant = Counter(self.page, calendar=1)
+        self.assertLessEqual(
+            bin(simhash(self.page) ^ simhash(self.variant)).count("1"), 3)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def resume(self, analytics):
+        totals = sum(analytics.word_freqs.values())
+        analytics = Analytics(
+            self.report_file, near_duplicates=SimHashIndex(3))
+        self.assertFalse(analytics.add_page(
+            "https://www.ics.uci.edu/calendar?day=2", self.variant,
+            simhash(self.variant)))
+        self.assertEqual(sum(analytics.word_freqs.values()), totals)
+        self.assertEqual(analytics.unique_urls, 2)
+
+    def test_after_snapshot(self):
+        analytics = Analytics(self.report_file, restart=True)
+        self.assertTrue(analytics.add_page(
+            "https://www.ics.uci.edu/calendar?day=1", self.page,
+            simhash(self.page)))
+        analytics.close()
+        self.resume(analytics)
+
+    def test_from_delta_log(self):
+        analytics = Analytics(self.report_file, restart=True)
+        analytics.add_page(
+            "https://www.ics.uci.edu/calendar?day=1", self.page,
+            simhash(self.page))
+        # crash before any snapshot: only the delta log is on disk
+        analytics.flush()
+        self.assertFalse(os.path.exists(analytics.report_file))
+        self.resume(analytics)
+
+
+if __name__ == "__main__":
+    unittest.main()
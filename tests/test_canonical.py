@@ -0,0 +1,42 @@
+import unittest
+
+from utils.canonical import Canonicalizer
+
+
+class CanonicalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.canonical = Canonicalizer().canonical
+
+    def test_index_page(self):
+        self.assertEqual(
+            self.canonical("https://WWW.ics.uci.edu:443/a/index.html"),
+            "https://www.ics.uci.edu/a")
+        self.assertEqual(
+            self.canonical("https://www.ics.uci.edu/a/index.php?utm_source=x"),
+            "https://www.ics.uci.edu/a")
+
+    def test_index_page_with_query(self):
+        # the server only knows the script by its name
+        self.assertEqual(
+            self.canonical(
+                "https://wiki.ics.uci.edu/w/index.php?title=Foo&action=history"),
+            "https://wiki.ics.uci.edu/w/index.php?action=history&title=Foo")
+
+    def test_query_kept_as_written(self):
+        self.assertEqual(
+            self.canonical("https://www.ics.uci.edu/a?print"),
+            "https://www.ics.uci.edu/a?print")
+        self.assertEqual(
+            self.canonical(
+                "https://www.ics.uci.edu/a?q=a+b%2Fc&sid=1&flag=&a=~x"),
+            "https://www.ics.uci.edu/a?a=~x&flag=&q=a+b%2Fc")
+
+    def test_repeated_params_keep_order(self):
+        self.assertEqual(
+            self.canonical("https://www.ics.uci.edu/a?b=2&a=1&b=1&&"),
+            "https://www.ics.uci.edu/a?a=1&b=2&b=1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils.simhash import SimHashIndex
+
+
+class SimHashIndexTest(unittest.TestCase):
+
+    def test_near_duplicate(self):
+        index = SimHashIndex(3)
+        self.assertFalse(index.check_and_add(0xF0F0))
+        self.assertTrue(index.check_and_add(0xF0F0 ^ 0b111))
+        self.assertFalse(index.check_and_add(0xF0F0 ^ 0b1111))
+        self.assertEqual(len(index), 2)
+
+    def test_max_size(self):
+        index = SimHashIndex(3, max_size=2)
+        for fingerprint in (0, (1 << 64) - 1, 0x5555555555555555):
+            index.add(fingerprint)
+        self.assertEqual(list(index), [(1 << 64) - 1, 0x5555555555555555])
+        self.assertIsNone(index.find(0))
+        self.assertEqual(sum(map(len, index.tables)), 2 * index.bands)
+
+    def test_save_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "fingerprints")
+            index = SimHashIndex(3)
+            index.update([3, 1 << 63, 12345])
+            index.save(path)
+            loaded = SimHashIndex(3)
+            loaded.load(path)
+            self.assertEqual(list(loaded), [3, 1 << 63, 12345])
+            self.assertIsNotNone(loaded.find(12345 ^ 1))
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,217 @@
+import os
+import json
+
+from threading import RLock
+from collections import Counter
+from urllib.parse import urlparse
+
+from utils.seenset import SeenSet
+from utils.simhash import SimHashIndex
+from utils.dumpfmt import ReportDump, is_dump, write_dump
+from utils.metrics import METRICS
+from utils.canonical import canonicalize
+
+
+class Analytics(object):
+    ''' In-memory crawl statistics with periodic checkpoints.
+
+    Every page appends one delta line to ``<report_file>.log``; every
+    ``snapshot_every`` pages the full state is written to ``report_file``
+    (in a format process_data.py reads: the mmap-able binary dump of
+    utils/dumpfmt.py, or JSON) and the delta log is truncated.
+    Recovery loads the last snapshot and replays the delta log on top.
+    Unique urls are kept as digests in a SeenSet, dumped next to the
+    snapshot as ``<report_file>.seen``. A url is counted once: a page
+    fetched again by a re-crawl keeps the words of its first version, so
+    the totals do not depend on how often pages change.
+
+    near_duplicates holds the SimHash fingerprints of the counted pages
+    (see add_page); they are dumped as ``<report_file>.simhash`` and
+    logged with the deltas, so near-duplicates are still recognised after
+    a resume. '''
+
+    def __init__(self, report_file, flush_every=50, snapshot_every=5000,
+                 restart=False, report_format="binary", near_duplicates=None):
+        self.report_file = report_file
+        self.report_format = report_format
+        self.delta_file = f"{report_file}.log"
+        self.seen_file = f"{report_file}.seen"
+        self.fingerprint_file = f"{report_file}.simhash"
+        self.flush_every = max(1, flush_every)
+        self.snapshot_every = max(1, snapshot_every)
+        self.lock = RLock()
+
+        self.seen_urls = SeenSet()
+        self.longest_page = ["NULL", -1]
+        self.word_freqs = Counter()
+        self.subdomains = Counter()
+        self.near_duplicates = (
+            near_duplicates if near_duplicates is not None else
+            SimHashIndex())
+
+        self._pending = list()
+        self._since_snapshot = 0
+        if restart:
+            for path in (self.report_file, self.delta_file, self.seen_file,
+                         self.fingerprint_file):
+                if os.path.exists(path):
+                    os.remove(path)
+        else:
+            self._recover()
+
+    @property
+    def unique_urls(self):
+        return len(self.seen_urls)
+
+    def add_page(self, url, words, fingerprint=None):
+        # words is either a list of tokens or a mapping of token -> count;
+        # fingerprint is the page's SimHash, if it has one. False if the
+        # page is a near-duplicate of one already counted: the url is
+        # counted, but not its words.
+        counts = words if isinstance(words, Counter) else Counter(words)
+        with self.lock:
+            if canonicalize(url) in self.seen_urls:
+                return True
+            duplicate = (
+                fingerprint is not None
+                and self.near_duplicates.find(fingerprint) is not None)
+            if duplicate:
+                counts, fingerprint = Counter(), None
+            self._apply(url, counts, fingerprint)
+            delta = {"url": url, "words": counts}
+            if fingerprint is not None:
+                delta["simhash"] = fingerprint
+            self._pending.append(json.dumps(delta) + "\n")
+            self._since_snapshot += 1
+            if self._since_snapshot >= self.snapshot_every:
+                self.snapshot()
+            elif len(self._pending) >= self.flush_every:
+                self.flush()
+            return not duplicate
+
+    def _apply(self, url, counts, fingerprint=None):
+        # update unique URLs (equivalent urls are one page, see
+        # utils/canonical.py)
+        self.seen_urls.add(canonicalize(url))
+
+        # update longest page
+        word_count = sum(counts.values())
+        if word_count > self.longest_page[1]:
+            self.longest_page = [url, word_count]
+
+        self.word_freqs.update(counts)
+
+        # update uci.edu subdomains
+        hostname = urlparse(url).hostname
+        if hostname and (
+                hostname == "uci.edu" or hostname.endswith(".uci.edu")):
+            self.subdomains[hostname] += 1
+
+        if fingerprint is not None:
+            self.near_duplicates.add(fingerprint)
+
+    def flush(self):
+        # Append buffered deltas; a crash loses at most this buffer.
+        with self.lock:
+            if not self._pending:
+                return
+            with METRICS.time("persistence"), open(self.delta_file, "a") as file:
+                file.writelines(self._pending)
+                file.flush()
+                os.fsync(file.fileno())
+            self._pending = list()
+
+    def snapshot(self):
+        # Write the full state atomically, then drop the deltas it covers.
+        with self.lock, METRICS.time("persistence"):
+            self.seen_urls.save(self.seen_file)
+            self.near_duplicates.save(self.fingerprint_file)
+            tmp_file = f"{self.report_file}.tmp"
+            binary = self.report_format == "binary"
+            with open(tmp_file, "wb" if binary else "w") as file:
+                if binary:
+                    write_dump(file, self.to_dict())
+                else:
+                    json.dump(self.to_dict(), file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_file, self.report_file)
+            if os.path.exists(self.delta_file):
+                os.remove(self.delta_file)
+            self._pending = list()
+            self._since_snapshot = 0
+
+    def close(self):
+        self.snapshot()
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "unique_urls": self.unique_urls,
+                "longest_page": self.longest_page,
+                "word_freqs": self.word_freqs,
+                "subdomains": self.subdomains,
+                "total_subdomains": len(self.subdomains)}
+
+    def _recover(self):
+        if os.path.exists(self.report_file) and os.path.getsize(self.report_file):
+            data = load_report(self.report_file)
+            if os.path.exists(self.seen_file):
+                self.seen_urls = SeenSet.load(self.seen_file)
+            # snapshots from before the SeenSet carry the urls themselves
+            for url in data.get("seen_urls", ()):
+                self.seen_urls.add(url)
+            self.longest_page = list(data["longest_page"])
+            self.word_freqs = Counter(data["word_freqs"])
+            self.subdomains = Counter(data["subdomains"])
+            if os.path.exists(self.fingerprint_file):
+                self.near_duplicates.load(self.fingerprint_file)
+
+        replayed = 0
+        if os.path.exists(self.delta_file):
+            with open(self.delta_file) as file:
+                for line in file:
+                    try:
+                        delta = json.loads(line)
+                    except ValueError:
+                        # torn last line from an interrupted append
+                        break
+                    self._apply(
+                        delta["url"], Counter(delta["words"]),
+                        delta.get("simhash"))
+                    replayed += 1
+        self._since_snapshot = replayed
+        if replayed:
+            # fold the replayed deltas into a fresh snapshot
+            self.snapshot()
+
+
+def load_report(report_file):
+    # A report in either format as the dict Analytics.to_dict returns
+    if is_dump(report_file):
+        with ReportDump(report_file) as dump:
+            return {
+                "unique_urls": dump.unique_urls,
+                "longest_page": dump.longest_page,
+                "word_freqs": dict(dump.words()),
+                "subdomains": dump.subdomains(),
+                "total_subdomains": dump.total_subdomains}
+    with open(report_file) as file:
+        return json.load(file)
+
+
+def merge_reports(report_files, merged_file, report_format="binary"):
+    # Combine the partial reports of a sharded crawl into one report in the
+    # format process_data.py reads. Shards own disjoint hosts, so their
+    # urls and subdomains never overlap.
+    merged = Analytics(merged_file, restart=True, report_format=report_format)
+    for report_file in report_files:
+        partial = Analytics(report_file, report_format=report_format)
+        merged.seen_urls.update(partial.seen_urls)
+        if partial.longest_page[1] > merged.longest_page[1]:
+            merged.longest_page = list(partial.longest_page)
+        merged.word_freqs.update(partial.word_freqs)
+        merged.subdomains.update(partial.subdomains)
+        merged.near_duplicates.update(partial.near_duplicates)
+    merged.snapshot()
+    return merged
@@ -0,0 +1,80 @@
+import asyncio
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from utils.download import (
+    backoff_delay, cache_request, payload_limit, to_response, too_large)
+from utils.response import Response
+
+
+class AsyncDownloader(object):
+    ''' aiohttp client for the cache server with the same timeout and
+    retry policy as utils.download.download. '''
+
+    def __init__(self, config, logger=None):
+        if aiohttp is None:
+            raise RuntimeError(
+                "DOWNLOAD_MODE = async needs aiohttp "
+                "(python -m pip install aiohttp).")
+        self.config = config
+        self.logger = logger
+        self.session = None
+
+    async def open(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.config.in_flight),
+            timeout=aiohttp.ClientTimeout(
+                connect=self.config.connect_timeout,
+                sock_read=self.config.read_timeout))
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    @staticmethod
+    async def _read(resp, limit):
+        # same cap as utils.download.read_body
+        if limit and resp.content_length and resp.content_length > limit:
+            return None
+        chunks, size = list(), 0
+        async for chunk in resp.content.iter_chunked(64 * 1024):
+            size += len(chunk)
+            if limit and size > limit:
+                return None
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    async def download(self, url):
+        cache_url, params = cache_request(url, self.config)
+        limit = payload_limit(self.config)
+        status, content = None, None
+        for attempt in range(self.config.retries + 1):
+            if attempt:
+                await asyncio.sleep(backoff_delay(attempt - 1, self.config))
+            try:
+                async with self.session.get(cache_url, params=params) as resp:
+                    status, content = resp.status, await self._read(resp, limit)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = None
+                if self.logger:
+                    self.logger.warning(
+                        f"Cache request for {url} failed ({e!r}), "
+                        f"attempt {attempt + 1} of {self.config.retries + 1}.")
+                continue
+            if status < 500:
+                break
+        if status is None:
+            if self.logger:
+                self.logger.error(
+                    f"Could not reach cache server for url {url}.")
+            return Response({
+                "error": f"Could not reach cache server for url {url}.",
+                "status": 600,
+                "url": url})
+        if content is None:
+            return too_large(url, status, limit, self.logger)
+        return to_response(url, status, content, self.logger)
@@ -0,0 +1,140 @@
+import re
+import sys
+
+from fnmatch import fnmatchcase
+from functools import lru_cache
+from hashlib import sha256
+from inspect import getsource
+from urllib.parse import urlsplit, urlunsplit, unquote_plus, quote
+
+# One canonical form per page, so equivalent urls share one frontier and
+# shelve entry, one is_valid verdict and one analytics count:
+#   - scheme and host lower-cased, trailing dot and default port dropped
+#   - percent-escapes of unreserved characters decoded, the rest upper-cased
+#   - "." and ".." segments resolved, ;jsessionid= path parameters dropped
+#   - index.html (and friends, unless a query is left) and the trailing
+#     slash dropped
+#   - query parameters filtered by the allow/deny lists and sorted by
+#     name, each kept as written ("print", "q=a+b")
+#   - fragment dropped
+DEFAULT_PORTS = {"http": 80, "https": 443}
+INDEX_PAGES = frozenset([
+    "index.html", "index.htm", "index.php", "default.htm", "default.html"])
+# query parameters that never change the page (fnmatch patterns)
+DENY_PARAMS = (
+    "utm_*", "fbclid", "gclid", "msclkid", "mc_cid", "mc_eid", "_ga",
+    "sid", "sessionid", "session_id", "phpsessid", "jsessionid", "share",
+    "replytocom")
+
+_ESCAPE = re.compile(r"%([0-9A-Fa-f]{2})")
+_UNRESERVED = frozenset(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+_PATH_SAFE = "/%:@!$&'()*+,;=~"
+_SESSION_PARAM = re.compile(r";(jsessionid|phpsessid|sid)=[^/]*", re.I)
+
+
+def _normalize_escapes(text, safe):
+    def replace(match):
+        char = chr(int(match.group(1), 16))
+        return char if char in _UNRESERVED else "%" + match.group(1).upper()
+    # quote() leaves existing escapes alone since "%" is safe
+    return quote(_ESCAPE.sub(replace, text), safe=safe)
+
+
+def _resolve_dots(path):
+    segments = list()
+    for segment in path.split("/")[1:]:
+        if segment == "..":
+            if segments:
+                segments.pop()
+        elif segment != ".":
+            segments.append(segment)
+    return "/" + "/".join(segments)
+
+
+class Canonicalizer(object):
+    ''' Rewrites urls into their canonical form (see above).
+
+    allow, when given, lists the only query parameters kept; deny lists
+    parameters always dropped. Both take fnmatch patterns and are matched
+    case-insensitively. Results are cached per url. '''
+
+    def __init__(self, allow=None, deny=DENY_PARAMS, cache_size=1 << 16):
+        self.allow = tuple(name.lower() for name in allow) if allow else None
+        self.deny = tuple(name.lower() for name in deny or ())
+        self.canonical = lru_cache(maxsize=cache_size)(self._canonical)
+
+    def fingerprint(self):
+        # changes whenever the allow/deny lists do
+        return sha256(repr((self.allow, self.deny)).encode("utf-8")).hexdigest()
+
+    def keep_param(self, name):
+        name = name.lower()
+        if any(fnmatchcase(name, pattern) for pattern in self.deny):
+            return False
+        return self.allow is None or any(
+            fnmatchcase(name, pattern) for pattern in self.allow)
+
+    def _canonical(self, url):
+        try:
+            parts = urlsplit(url.strip())
+            port = parts.port
+        except ValueError:
+            # malformed netloc or port: leave it to is_valid to reject
+            return url
+        scheme = parts.scheme.lower()
+        host = (parts.hostname or "").rstrip(".")
+        if ":" in host:
+            host = f"[{host}]"
+        if parts.username or parts.password:
+            host = parts.netloc.rpartition("@")[0] + "@" + host
+        netloc = host
+        if port is not None and port != DEFAULT_PORTS.get(scheme):
+            netloc = f"{host}:{port}"
+
+        path = _SESSION_PARAM.sub("", parts.path)
+        path = _normalize_escapes(path, _PATH_SAFE)
+        if path.startswith("/"):
+            path = _resolve_dots(path)
+
+        # the raw name[=value] pieces, so the url fetched is one the
+        # server linked; stable sort: repeated names keep their order
+        params = list()
+        for param in parts.query.split("&"):
+            name = unquote_plus(param.partition("=")[0])
+            if param and self.keep_param(name):
+                params.append((name, param))
+        params.sort(key=lambda param: param[0])
+        query = "&".join(param for _, param in params)
+
+        # /w/index.php?title=Foo is not the same page as /w?title=Foo
+        head, _, last = path.rpartition("/")
+        if not query and last.lower() in INDEX_PAGES:
+            path = head
+        path = path.rstrip("/")
+        return urlunsplit((scheme, netloc, path, query, ""))
+
+
+_canonicalizer = Canonicalizer()
+
+
+def configure(allow=None, deny=DENY_PARAMS):
+    # called once per process from the crawler config
+    global _canonicalizer
+    _canonicalizer = Canonicalizer(allow, deny)
+
+
+def get_canonicalizer():
+    return _canonicalizer
+
+
+def canonicalize(url):
+    return _canonicalizer.canonical(url)
+
+
+def fingerprint():
+    # Hash of these rules and the configured lists. The frontier stores it
+    # with its save file and re-canonicalizes pending urls when it changes.
+    return sha256(
+        (getsource(sys.modules[__name__]) + _canonicalizer.fingerprint())
+        .encode("utf-8")).hexdigest()
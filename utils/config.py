@@ -1,5 +1,7 @@
 import re
 
+from utils.canonical import DENY_PARAMS
+
 
 class Config(object):
     def __init__(self, config):
@@ -8,12 +10,64 @@ class Config(object):
         assert self.user_agent != "DEFAULT AGENT", "Set useragent in config.ini"
         assert re.match(r"^[a-zA-Z0-9_ ,]+$", self.user_agent), "User agent should not have any special characters outside '_', ',' and 'space'"
         self.threads_count = int(config["LOCAL PROPERTIES"]["THREADCOUNT"])
+        self.process_count = config["LOCAL PROPERTIES"].getint("PROCESSCOUNT", 1)
         self.save_file = config["LOCAL PROPERTIES"]["SAVE"]
+        self.store_backend = config["LOCAL PROPERTIES"].get("STORE", "shelve").strip().lower()
+        self.store_flush_count = config["LOCAL PROPERTIES"].getint("FLUSH_COUNT", 100)
+        self.store_flush_interval = config["LOCAL PROPERTIES"].getfloat("FLUSH_INTERVAL", 5.0)
+        self.bloom_capacity = config["LOCAL PROPERTIES"].getint("BLOOM_CAPACITY", 0)
+        self.metrics_port = config["LOCAL PROPERTIES"].getint("METRICS_PORT", 0)
+        self.metrics_log_interval = config["LOCAL PROPERTIES"].getfloat("METRICS_LOG_INTERVAL", 60)
+        self.data_report = config["LOCAL PROPERTIES"].get("DATA_REPORT", "data_report.txt")
+        self.report_flush_every = config["LOCAL PROPERTIES"].getint("REPORT_FLUSH_EVERY", 50)
+        self.report_snapshot_every = config["LOCAL PROPERTIES"].getint("REPORT_SNAPSHOT_EVERY", 5000)
+        self.report_format = config["LOCAL PROPERTIES"].get("REPORT_FORMAT", "binary").strip().lower()
+        assert self.report_format in ("binary", "json"), "REPORT_FORMAT should be 'binary' or 'json'"
+        self.checkpoint_interval = config["LOCAL PROPERTIES"].getfloat("CHECKPOINT_INTERVAL", 300)
+
+        self.log_level = config["LOCAL PROPERTIES"].get("LOG_LEVEL", "INFO").strip().upper()
+        self.log_sample = config["LOCAL PROPERTIES"].getfloat("LOG_SAMPLE", 1.0)
+        self.log_batch = config["LOCAL PROPERTIES"].getint("LOG_BATCH", 100)
+        self.log_flush_interval = config["LOCAL PROPERTIES"].getfloat("LOG_FLUSH_INTERVAL", 1.0)
+        self.download_mode = config["LOCAL PROPERTIES"].get("DOWNLOAD_MODE", "threads").strip().lower()
+        assert self.download_mode in ("threads", "async"), "DOWNLOAD_MODE should be 'threads' or 'async'"
+        self.in_flight = config["LOCAL PROPERTIES"].getint("IN_FLIGHT", 1) if self.download_mode == "async" else 1
 
         self.host = config["CONNECTION"]["HOST"]
         self.port = int(config["CONNECTION"]["PORT"])
+        self.connect_timeout = config["CONNECTION"].getfloat("CONNECT_TIMEOUT", 5.0)
+        self.read_timeout = config["CONNECTION"].getfloat("READ_TIMEOUT", 30.0)
+        self.retries = config["CONNECTION"].getint("RETRIES", 3)
+        self.backoff = config["CONNECTION"].getfloat("BACKOFF", 0.5)
+        self.max_backoff = config["CONNECTION"].getfloat("MAX_BACKOFF", 10.0)
 
         self.seed_urls = config["CRAWLER"]["SEEDURL"].split(",")
         self.time_delay = float(config["CRAWLER"]["POLITENESS"])
+        self.max_body_size = config["CRAWLER"].getint("MAX_BODY_SIZE", 4 * 1024 * 1024)
+        self.query_allow = [name.strip() for name in config["CRAWLER"].get("QUERY_ALLOW", "").split(",") if name.strip()]
+        self.query_deny = [name.strip() for name in config["CRAWLER"].get("QUERY_DENY", ",".join(DENY_PARAMS)).split(",") if name.strip()]
+        self.robots = config["CRAWLER"].getboolean("ROBOTS", True)
+        self.robots_ttl = config["CRAWLER"].getfloat("ROBOTS_TTL", 86400)
+        self.robots_cache_size = config["CRAWLER"].getint("ROBOTS_CACHE_SIZE", 1024)
+        self.robots_retry_ttl = config["CRAWLER"].getfloat("ROBOTS_RETRY_TTL", 600)
+        self.robots_retries = config["CRAWLER"].getint("ROBOTS_RETRIES", 3)
+        self.max_crawl_delay = config["CRAWLER"].getfloat("MAX_CRAWL_DELAY", 10.0)
+        self.sitemaps = config["CRAWLER"].getboolean("SITEMAPS", True)
+        self.sitemap_max_urls = config["CRAWLER"].getint("SITEMAP_MAX_URLS", 5000)
+        self.priority = config["CRAWLER"].get("PRIORITY", "depth:1,novelty:0.5,trap:100")
+        self.max_depth = config["CRAWLER"].getint("MAX_DEPTH", 0)
+        self.trap_budget = config["CRAWLER"].getint("TRAP_BUDGET", 2000)
+        self.trap_min_pages = config["CRAWLER"].getint("TRAP_MIN_PAGES", 20)
+        self.trap_min_yield = config["CRAWLER"].getfloat("TRAP_MIN_YIELD", 0.2)
+        self.recrawl = config["CRAWLER"].getboolean("RECRAWL", False)
+        self.recrawl_interval = config["CRAWLER"].getfloat("RECRAWL_INTERVAL", 86400)
+        self.recrawl_min_interval = config["CRAWLER"].getfloat("RECRAWL_MIN_INTERVAL", 3600)
+        self.recrawl_max_interval = config["CRAWLER"].getfloat("RECRAWL_MAX_INTERVAL", 30 * 86400)
+        self.content_types = tuple(
+            content_type.strip().lower()
+            for content_type in config["CRAWLER"].get("CONTENT_TYPES", "text/html,application/xhtml+xml").split(",")
+            if content_type.strip())
 
-        self.cache_server = None
\ No newline at end of file
+        self.cache_server = None
+        # launch.py --record: append every downloaded response to this file
+        self.record_file = None
\ No newline at end of file
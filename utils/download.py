@@ -1,21 +1,128 @@
+import random
 import requests
 import cbor
 import time
 
+from threading import Lock
+from requests.adapters import HTTPAdapter
+
 from utils.response import Response
 
-def download(url, config, logger=None):
+# One keep-alive session shared by every worker; its connection pool is
+# sized for the number of threads talking to the cache server.
+_session = None
+_session_lock = Lock()
+
+# cbor and pickle framing around a body, on top of MAX_BODY_SIZE
+PAYLOAD_OVERHEAD = 64 * 1024
+
+
+def get_session(config):
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=max(config.threads_count * config.in_flight, 10))
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+    return _session
+
+
+def backoff_delay(attempt, config):
+    # Exponential backoff with full jitter, capped at MAX_BACKOFF.
+    return random.uniform(
+        0, min(config.max_backoff, config.backoff * (2 ** attempt)))
+
+
+def cache_request(url, config):
     host, port = config.cache_server
-    resp = requests.get(
-        f"http://{host}:{port}/",
-        params=[("q", f"{url}"), ("u", f"{config.user_agent}")])
+    return (f"http://{host}:{port}/",
+            [("q", f"{url}"), ("u", f"{config.user_agent}")])
+
+
+def payload_limit(config):
+    # longest cache reply worth reading, or None for no limit
+    if config.max_body_size:
+        return config.max_body_size + PAYLOAD_OVERHEAD
+    return None
+
+
+def too_large(url, status_code, limit, logger=None):
+    if logger:
+        logger.info(f"Skipped {url}: cache reply over {limit} bytes.")
+    return Response({
+        "error": f"Cache reply for {url} is over {limit} bytes.",
+        "status": status_code,
+        "skipped": "too_large",
+        "url": url})
+
+
+def read_body(resp, limit):
+    # The cache reply, or None if it is longer than limit bytes. Oversized
+    # replies are dropped from their Content-Length, or as soon as the
+    # streamed body passes the limit, without reading the rest.
+    length = resp.headers.get("Content-Length")
+    if limit and length and length.isdigit() and int(length) > limit:
+        resp.close()
+        return None
+    chunks, size = list(), 0
+    for chunk in resp.iter_content(64 * 1024):
+        size += len(chunk)
+        if limit and size > limit:
+            resp.close()
+            return None
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def to_response(url, status_code, content, logger=None):
     try:
-        if resp and resp.content:
-            return Response(cbor.loads(resp.content))
-    except (EOFError, ValueError) as e:
+        if content:
+            return Response(cbor.loads(content))
+    except (EOFError, ValueError):
         pass
-    logger.error(f"Spacetime Response error {resp} with url {url}.")
+    if logger:
+        logger.error(
+            f"Spacetime Response error <{status_code}> with url {url}.")
     return Response({
-        "error": f"Spacetime Response error {resp} with url {url}.",
-        "status": resp.status_code,
+        "error": f"Spacetime Response error <{status_code}> with url {url}.",
+        "status": status_code,
         "url": url})
+
+
+def download(url, config, logger=None):
+    cache_url, params = cache_request(url, config)
+    session = get_session(config)
+    limit = payload_limit(config)
+    status_code, content = None, None
+    for attempt in range(config.retries + 1):
+        if attempt:
+            time.sleep(backoff_delay(attempt - 1, config))
+        try:
+            resp = session.get(
+                cache_url, params=params,
+                timeout=(config.connect_timeout, config.read_timeout),
+                stream=True)
+            status_code, content = resp.status_code, read_body(resp, limit)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            status_code = None
+            if logger:
+                logger.warning(
+                    f"Cache request for {url} failed ({e}), "
+                    f"attempt {attempt + 1} of {config.retries + 1}.")
+            continue
+        if status_code < 500:
+            break
+    if status_code is None:
+        if logger:
+            logger.error(f"Could not reach cache server for url {url}.")
+        return Response({
+            "error": f"Could not reach cache server for url {url}.",
+            "status": 600,
+            "url": url})
+    if content is None:
+        return too_large(url, status_code, limit, logger)
+    return to_response(url, status_code, content, logger)
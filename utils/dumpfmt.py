@@ -0,0 +1,171 @@
+import mmap
+import heapq
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Binary analytics report, read through mmap without loading it whole:
+#
+#   header      magic, version, word count, subdomain count, longest url
+#               length, unique urls, longest page words, byte lengths of
+#               the word and subdomain string blobs
+#   u64[words]  word counts, by word id
+#   u64[subs]   subdomain counts, by subdomain id
+#   u32[words+1], u32[subs+1]
+#               offsets of each string in its blob
+#   blobs       utf-8 words (sorted, so the id order is alphabetical),
+#               subdomains, then the url of the longest page
+MAGIC = b"CRAWLRPT"
+VERSION = 1
+HEADER = struct.Struct("<8sIIIIQqQQ")
+
+
+def is_dump(path):
+    with open(path, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def _strings(values):
+    blob = bytearray()
+    offsets = [0]
+    for value in values:
+        blob += value.encode("utf-8")
+        offsets.append(len(blob))
+    return bytes(blob), offsets
+
+
+def write_dump(file, data):
+    # data is Analytics.to_dict(): unique_urls, longest_page, word_freqs,
+    # subdomains
+    words = sorted(data["word_freqs"])
+    subdomains = sorted(data["subdomains"])
+    word_blob, word_offsets = _strings(words)
+    subdomain_blob, subdomain_offsets = _strings(subdomains)
+    longest_url, longest_words = data["longest_page"]
+    longest_blob = str(longest_url).encode("utf-8")
+    file.write(HEADER.pack(
+        MAGIC, VERSION, len(words), len(subdomains), len(longest_blob),
+        data["unique_urls"], longest_words, len(word_blob),
+        len(subdomain_blob)))
+    file.write(struct.pack(
+        f"<{len(words)}Q", *(data["word_freqs"][word] for word in words)))
+    file.write(struct.pack(
+        f"<{len(subdomains)}Q",
+        *(data["subdomains"][subdomain] for subdomain in subdomains)))
+    file.write(struct.pack(f"<{len(word_offsets)}I", *word_offsets))
+    file.write(struct.pack(f"<{len(subdomain_offsets)}I", *subdomain_offsets))
+    file.write(word_blob)
+    file.write(subdomain_blob)
+    file.write(longest_blob)
+
+
+class ReportDump(object):
+    ''' Read-only view of a binary report over an mmap. '''
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.word_count, self.subdomain_count,
+         longest_length, self.unique_urls, longest_words, word_bytes,
+         subdomain_bytes) = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            self.data.close()
+            raise ValueError(f"{path} is not a binary report.")
+        position = HEADER.size
+        self._counts_at = position
+        position += 8 * self.word_count
+        self._subdomain_counts_at = position
+        position += 8 * self.subdomain_count
+        self._offsets_at = position
+        position += 4 * (self.word_count + 1)
+        self._subdomain_offsets_at = position
+        position += 4 * (self.subdomain_count + 1)
+        self._words_at = position
+        self._subdomains_at = position + word_bytes
+        longest_at = self._subdomains_at + subdomain_bytes
+        self.longest_page = [
+            self.data[longest_at:longest_at + longest_length].decode("utf-8"),
+            longest_words]
+
+        view = memoryview(self.data)
+        self.counts = view[
+            self._counts_at:self._subdomain_counts_at].cast("Q")
+        self.subdomain_counts = view[
+            self._subdomain_counts_at:self._offsets_at].cast("Q")
+        self.offsets = view[
+            self._offsets_at:self._subdomain_offsets_at].cast("I")
+        self.subdomain_offsets = view[
+            self._subdomain_offsets_at:self._words_at].cast("I")
+        view.release()
+
+    @property
+    def total_subdomains(self):
+        return self.subdomain_count
+
+    def word(self, index):
+        start = self._words_at + self.offsets[index]
+        end = self._words_at + self.offsets[index + 1]
+        return self.data[start:end].decode("utf-8")
+
+    def words(self):
+        for index in range(self.word_count):
+            yield self.word(index), self.counts[index]
+
+    def subdomains(self):
+        result = dict()
+        for index in range(self.subdomain_count):
+            start = self._subdomains_at + self.subdomain_offsets[index]
+            end = self._subdomains_at + self.subdomain_offsets[index + 1]
+            result[self.data[start:end].decode("utf-8")] = (
+                self.subdomain_counts[index])
+        return result
+
+    def top_words(self, k, min_length=2):
+        # The k most frequent words of at least min_length bytes (tokens
+        # are ASCII), ties in alphabetical order. Lengths come from the
+        # offsets, so only the k winners are ever decoded.
+        if k <= 0:
+            return list()
+        if numpy is not None:
+            indexes = self._top_numpy(k, min_length)
+        else:
+            offsets = self.offsets
+            indexes = heapq.nsmallest(
+                k,
+                (index for index in range(self.word_count)
+                 if offsets[index + 1] - offsets[index] >= min_length),
+                key=lambda index: (-self.counts[index], index))
+        return [(self.word(index), self.counts[index]) for index in indexes]
+
+    def _top_numpy(self, k, min_length):
+        counts = numpy.frombuffer(
+            self.data, dtype="<u8", count=self.word_count,
+            offset=self._counts_at).astype(numpy.int64)
+        lengths = numpy.diff(numpy.frombuffer(
+            self.data, dtype="<u4", count=self.word_count + 1,
+            offset=self._offsets_at))
+        candidates = numpy.flatnonzero(lengths >= min_length)
+        if len(candidates) > k:
+            candidates = candidates[
+                numpy.argpartition(-counts[candidates], k - 1)[:k]]
+            # argpartition may cut a tie at the k-th count arbitrarily
+            cutoff = counts[candidates].min()
+            candidates = numpy.flatnonzero(
+                (lengths >= min_length) & (counts >= cutoff))
+        order = numpy.lexsort((candidates, -counts[candidates]))
+        return [int(index) for index in candidates[order][:k]]
+
+    def close(self):
+        for view in (self.counts, self.subdomain_counts, self.offsets,
+                     self.subdomain_offsets):
+            view.release()
+        self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
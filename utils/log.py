@@ -0,0 +1,222 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import zlib
+
+from threading import Lock
+from logging.handlers import QueueHandler, QueueListener
+
+# Loggers only put records on a queue; one listener thread per process
+# formats them and writes them out in batches, so workers never wait on
+# the disk or the terminal. Files under Logs/ get one JSON object per line,
+# the console gets the usual text lines.
+LOG_DIR = "Logs"
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# attributes every LogRecord has; anything else came in through extra=
+_RECORD_FIELDS = set(vars(logging.LogRecord(
+    "", logging.INFO, "", 0, "", None, None))) | {"message", "log_file"}
+
+_settings = {
+    "level": logging.INFO,
+    "sample": 1.0,
+    "batch_size": 100,
+    "flush_interval": 1.0,
+}
+_loggers = dict()
+_lock = Lock()
+_queue = None
+_listener = None
+_listener_pid = None
+_atexit_registered = False
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "created": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "process": record.process,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        return json.dumps(entry, default=str)
+
+
+class JsonLinesHandler(logging.Handler):
+    ''' Writes every record to Logs/<log_file>.log as a JSON line. Files
+    are only flushed by flush(), which the listener calls per batch. '''
+
+    def __init__(self, directory=LOG_DIR):
+        super().__init__()
+        self.directory = directory
+        self.files = dict()
+        self.setFormatter(JsonFormatter())
+
+    def emit(self, record):
+        try:
+            name = getattr(record, "log_file", None) or record.name
+            file = self.files.get(name)
+            if file is None:
+                os.makedirs(self.directory, exist_ok=True)
+                file = self.files[name] = open(
+                    os.path.join(self.directory, f"{name}.log"), "a")
+            file.write(self.format(record) + "\n")
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        for file in self.files.values():
+            file.flush()
+
+    def close(self):
+        self.flush()
+        for file in self.files.values():
+            file.close()
+        self.files = dict()
+        super().close()
+
+
+class BatchStreamHandler(logging.StreamHandler):
+    # StreamHandler.emit flushes after every record; here the listener
+    # flushes once per batch
+    def emit(self, record):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+class BatchListener(QueueListener):
+    ''' QueueListener that flushes its handlers every batch_size records,
+    and whenever the queue has been idle for flush_interval seconds. '''
+
+    def __init__(self, log_queue, *handlers, batch_size=100,
+                 flush_interval=1.0):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.unflushed = 0
+
+    def dequeue(self, block):
+        while True:
+            try:
+                return self.queue.get(block, timeout=self.flush_interval)
+            except queue.Empty:
+                if not block:
+                    raise
+                self.flush()
+
+    def handle(self, record):
+        super().handle(record)
+        self.unflushed += 1
+        if self.unflushed >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.unflushed:
+            for handler in self.handlers:
+                handler.flush()
+            self.unflushed = 0
+
+    def stop(self):
+        super().stop()
+        self.flush()
+        for handler in self.handlers:
+            handler.close()
+
+
+class SampleFilter(logging.Filter):
+    ''' Keeps a `sample` fraction of the per-url lines (records logged
+    with extra={"url": ...}) below WARNING. The choice is by url hash, so
+    every line of a sampled url is kept. '''
+
+    def filter(self, record):
+        rate = _settings["sample"]
+        url = getattr(record, "url", None)
+        if url is None or rate >= 1 or record.levelno >= logging.WARNING:
+            return True
+        return zlib.crc32(str(url).encode("utf-8")) % 10000 < rate * 10000
+
+
+class _QueueHandler(QueueHandler):
+    # Enqueues on the queue of the current process: a forked shard starts
+    # its own listener instead of filling its parent's queue.
+    def __init__(self, log_file):
+        super().__init__(None)
+        self.log_file = log_file
+
+    def prepare(self, record):
+        record = super().prepare(record)
+        record.log_file = self.log_file
+        return record
+
+    def enqueue(self, record):
+        _get_queue().put_nowait(record)
+
+
+def _get_queue():
+    global _queue, _listener, _listener_pid, _atexit_registered
+    if _listener_pid != os.getpid():
+        with _lock:
+            if _listener_pid != os.getpid():
+                console = BatchStreamHandler(sys.stderr)
+                console.setFormatter(logging.Formatter(TEXT_FORMAT))
+                _queue = queue.Queue()
+                _listener = BatchListener(
+                    _queue, JsonLinesHandler(), console,
+                    batch_size=_settings["batch_size"],
+                    flush_interval=_settings["flush_interval"])
+                _listener.start()
+                if not _atexit_registered:
+                    atexit.register(shutdown_logging)
+                    _atexit_registered = True
+                _listener_pid = os.getpid()
+    return _queue
+
+
+def shutdown_logging():
+    # Writes out everything still queued. Call before a process exits
+    # without running atexit (multiprocessing children).
+    global _listener, _listener_pid
+    with _lock:
+        if _listener is not None and _listener_pid == os.getpid():
+            _listener.stop()
+            _listener = None
+            _listener_pid = None
+
+
+def configure_logging(level="INFO", sample=1.0, batch_size=100,
+                      flush_interval=1.0):
+    with _lock:
+        _settings["level"] = logging.getLevelName(str(level).upper())
+        _settings["sample"] = sample
+        _settings["batch_size"] = batch_size
+        _settings["flush_interval"] = flush_interval
+        if _listener is not None:
+            _listener.batch_size = max(1, batch_size)
+            _listener.flush_interval = flush_interval
+        for logger in _loggers.values():
+            logger.setLevel(_settings["level"])
+
+
+def get_logger(name, filename=None):
+    # The same logger (and handler) every time name is requested again.
+    with _lock:
+        logger = _loggers.get(name)
+        if logger is None:
+            logger = logging.getLogger(name)
+            logger.setLevel(_settings["level"])
+            logger.propagate = False
+            handler = _QueueHandler(filename if filename else name)
+            handler.addFilter(SampleFilter())
+            logger.addHandler(handler)
+            _loggers[name] = logger
+    return logger
@@ -0,0 +1,211 @@
+import time
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock, Thread, Event
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# upper bounds, in seconds, of the stage timing histogram buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+           2.5, 5.0, 10.0, 30.0)
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(
+        f'{name}="{str(value)}"'.replace("\n", " ") for name, value in pairs
+    ) + "}"
+
+
+class Histogram(object):
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics(object):
+    ''' Process-wide counters, stage timing histograms and gauges,
+    rendered in the Prometheus text format. '''
+
+    def __init__(self):
+        self.lock = Lock()
+        self.counters = dict()
+        self.histograms = dict()
+        self.gauges = dict()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _labels(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, _labels(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def time(self, stage):
+        # with METRICS.time("parse"): ...
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(
+                "crawler_stage_seconds", time.perf_counter() - start,
+                stage=stage)
+
+    def register_gauge(self, name, callback):
+        # callback() returns a number, or a list of (labels dict, number)
+        # pairs for a labelled gauge
+        with self.lock:
+            self.gauges[name] = callback
+
+    def gauge(self, name, default=0):
+        # current value of an unlabelled gauge
+        with self.lock:
+            callback = self.gauges.get(name)
+        return default if callback is None else callback()
+
+    def counter(self, name, **labels):
+        with self.lock:
+            return self.counters.get((name, _labels(labels)), 0)
+
+    def counter_total(self, name):
+        with self.lock:
+            return sum(
+                value for (counter, _), value in self.counters.items()
+                if counter == name)
+
+    def render(self):
+        lines = list()
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                self.histograms.items(), key=lambda item: item[0])
+            gauges = sorted(self.gauges.items())
+            snapshots = [
+                (key, list(histogram.counts), histogram.sum, histogram.count)
+                for key, histogram in histograms]
+
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for (name, labels), counts, total, count in snapshots:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS + ("+Inf",), counts):
+                cumulative += bucket
+                lines.append(
+                    f"{name}_bucket{_format_labels(labels, [('le', bound)])} "
+                    f"{cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        for name, callback in gauges:
+            lines.append(f"# TYPE {name} gauge")
+            value = callback()
+            if isinstance(value, (int, float)):
+                lines.append(f"{name} {value}")
+            else:
+                for labels, sample in value:
+                    lines.append(
+                        f"{name}{_format_labels(_labels(labels))} {sample}")
+        return "\n".join(lines) + "\n"
+
+    def stage_means(self):
+        with self.lock:
+            return {
+                dict(labels).get("stage", name): histogram.sum / histogram.count
+                for (name, labels), histogram in self.histograms.items()
+                if histogram.count}
+
+
+# the registry every module records into
+METRICS = Metrics()
+
+
+class MetricsServer(Thread):
+    ''' Serves METRICS at http://<host>:<port>/metrics. '''
+
+    def __init__(self, port, host="127.0.0.1", metrics=METRICS):
+        registry = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header(
+                    "Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        super().__init__(daemon=True)
+
+    def run(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class SummaryLogger(Thread):
+    ''' Logs pages/sec, bytes/sec, the urls queued and in flight, and mean
+    stage times every interval. '''
+
+    def __init__(self, logger, interval, metrics=METRICS):
+        self.logger = logger
+        self.interval = interval
+        self.metrics = metrics
+        self.stopped = Event()
+        super().__init__(daemon=True)
+
+    def run(self):
+        pages = self.metrics.counter_total("crawler_pages_total")
+        size = self.metrics.counter_total("crawler_bytes_total")
+        while not self.stopped.wait(self.interval):
+            new_pages = self.metrics.counter_total("crawler_pages_total")
+            new_size = self.metrics.counter_total("crawler_bytes_total")
+            stages = ", ".join(
+                f"{stage} {mean * 1000:.1f}ms"
+                for stage, mean in sorted(self.metrics.stage_means().items()))
+            self.logger.info(
+                f"{(new_pages - pages) / self.interval:.2f} pages/s, "
+                f"{(new_size - size) / self.interval / 1024:.1f} KiB/s, "
+                f"{new_pages} pages total, "
+                f"{self.metrics.gauge('crawler_urls_queued')} queued, "
+                f"{self.metrics.gauge('crawler_urls_in_flight')} in flight; "
+                f"mean stage times: {stages}.")
+            pages, size = new_pages, new_size
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,209 @@
+import re
+
+from html.parser import HTMLParser
+from urllib.parse import urldefrag, urljoin
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+# text inside these tags is not part of the visible page (matches what
+# BeautifulSoup.get_text leaves out)
+INVISIBLE_TAGS = frozenset(["script", "style", "template"])
+# markup libxml2 reads differently from html.parser, the parser behind the
+# BeautifulSoup reference: it drops CDATA sections and keeps the markup
+# inside <textarea> as text. Pages containing it use the stdlib parser.
+STDLIB_ONLY = re.compile(r"<!\[CDATA\[|<textarea", re.IGNORECASE)
+
+
+class Page(object):
+    def __init__(self, links, text_chunks):
+        # absolute, defragmented targets of every <a href>
+        self.links = links
+        # visible text nodes, already stripped, in document order
+        self.text_chunks = text_chunks
+
+    def get_text(self, separator=""):
+        # same as BeautifulSoup(...).get_text(separator, strip=True)
+        return separator.join(self.text_chunks)
+
+
+class _PageCollector(object):
+    ''' Event sink shared by the stdlib and lxml parsers. '''
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.links = list()
+        self.text_chunks = list()
+        self.invisible_depth = 0
+        # pieces of the current text node: lxml reports one node in several
+        # data() calls (around entities, for one)
+        self.pending = list()
+
+    def flush_text(self):
+        # end of a text node: any tag, comment or the end of the document
+        if self.pending:
+            data = "".join(self.pending).strip()
+            self.pending = list()
+            if data:
+                self.text_chunks.append(data)
+
+    def on_start(self, tag, href):
+        self.flush_text()
+        if tag == "a" and href is not None:
+            self.links.append(urldefrag(urljoin(self.base_url, href))[0])
+        elif tag in INVISIBLE_TAGS:
+            self.invisible_depth += 1
+
+    def on_end(self, tag):
+        self.flush_text()
+        if tag in INVISIBLE_TAGS and self.invisible_depth:
+            self.invisible_depth -= 1
+
+    def on_data(self, data):
+        if not self.invisible_depth:
+            self.pending.append(data)
+
+    def page(self):
+        self.flush_text()
+        return Page(self.links, self.text_chunks)
+
+
+class _StdlibParser(HTMLParser):
+    def __init__(self, collector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        href = None
+        if tag == "a":
+            for name, value in attrs:
+                if name == "href":
+                    href = value or ""
+                    break
+        self.collector.on_start(tag, href)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        self.collector.on_end(tag)
+
+    def handle_endtag(self, tag):
+        self.collector.on_end(tag)
+
+    def handle_data(self, data):
+        self.collector.on_data(data)
+
+    def handle_comment(self, data):
+        self.collector.flush_text()
+
+    def unknown_decl(self, data):
+        # <![CDATA[...]]> is text to BeautifulSoup as well
+        self.collector.flush_text()
+        if data.startswith("CDATA["):
+            self.collector.on_data(data[len("CDATA["):])
+            self.collector.flush_text()
+
+
+class _LxmlTarget(object):
+    def __init__(self, collector):
+        self.collector = collector
+
+    def start(self, tag, attrib):
+        if isinstance(tag, str):
+            self.collector.on_start(tag, attrib.get("href"))
+
+    def end(self, tag):
+        if isinstance(tag, str):
+            self.collector.on_end(tag)
+
+    def data(self, data):
+        self.collector.on_data(data)
+
+    def comment(self, text):
+        self.collector.flush_text()
+
+    def close(self):
+        return self.collector.page()
+
+
+def decode(content):
+    if isinstance(content, str):
+        return content
+    try:
+        return content.decode("utf-8")
+    except UnicodeDecodeError:
+        pass
+    try:
+        from bs4.dammit import UnicodeDammit
+        markup = UnicodeDammit(content).unicode_markup
+        if markup is not None:
+            return markup
+    except ImportError:
+        pass
+    return content.decode("latin-1")
+
+
+def parse_with_lxml(url, text):
+    collector = _PageCollector(url)
+    parser = etree.HTMLParser(target=_LxmlTarget(collector))
+    parser.feed(text)
+    return parser.close()
+
+
+def parse_with_stdlib(url, text):
+    collector = _PageCollector(url)
+    parser = _StdlibParser(collector)
+    parser.feed(text)
+    parser.close()
+    return collector.page()
+
+
+def parse_with_bs4(url, content):
+    # reference implementation: the original two BeautifulSoup passes
+    from bs4 import BeautifulSoup
+    html = BeautifulSoup(content, "html.parser")
+    links = [
+        urldefrag(urljoin(url, tag["href"]))[0]
+        for tag in html.find_all("a", href=True)]
+    return Page(links, list(html.stripped_strings))
+
+
+def parse_page(url, content, use_lxml=True):
+    ''' Parse a page once and return its links and visible text.
+
+    Uses lxml's event target when available, the stdlib HTMLParser
+    otherwise, and falls back to BeautifulSoup if both fail. '''
+    if not content:
+        return Page(list(), list())
+    try:
+        text = decode(content)
+        if use_lxml and etree is not None and not STDLIB_ONLY.search(text):
+            return parse_with_lxml(url, text)
+        return parse_with_stdlib(url, text)
+    except Exception:
+        return parse_with_bs4(url, content)
+
+
+def check_parity(url, content, use_lxml=True):
+    # Compare the single-pass output with the BeautifulSoup reference.
+    # Returns a list of human readable differences (empty when equal).
+    fast = parse_page(url, content, use_lxml)
+    reference = parse_with_bs4(url, content)
+    differences = list()
+    if fast.links != reference.links:
+        differences.append(
+            f"links: {len(fast.links)} vs {len(reference.links)} (bs4)")
+    # the scraper tokenizes get_text(" "), so compare that
+    fast_tokens = fast.get_text(" ").split()
+    reference_tokens = reference.get_text(" ").split()
+    if fast_tokens != reference_tokens:
+        index = next(
+            (i for i, (a, b) in enumerate(zip(fast_tokens, reference_tokens))
+             if a != b), min(len(fast_tokens), len(reference_tokens)))
+        differences.append(
+            f"text tokens differ from bs4 get_text(\" \") at token {index}: "
+            f"{fast_tokens[index:index + 3]} vs "
+            f"{reference_tokens[index:index + 3]}")
+    return differences
+
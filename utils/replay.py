@@ -0,0 +1,133 @@
+import json
+import time
+import base64
+import pickle
+
+from functools import lru_cache
+from threading import Thread, Lock
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cbor
+
+# Recorded crawls are JSON lines:
+#   {"url": ..., "status": 200, "headers": {...}, "content": <base64>}
+# A stand-in cache server replays them with the same cbor wire format as
+# the spacetime cache, so the crawler runs offline and repeatably.
+
+
+class RecordedResponse(object):
+    ''' The parts of requests.Response the crawler reads, picklable
+    without requests installed. '''
+
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", "replace")
+
+
+def load_recordings(path):
+    recordings = dict()
+    with open(path) as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                recordings[record["url"]] = record
+    return recordings
+
+
+def encode_record(url, record):
+    # The cbor payload the cache server would send for a recording.
+    if record is None:
+        return cbor.dumps({
+            "url": url, "status": 404,
+            "error": f"{url} is not in the recording."})
+    response = RecordedResponse(
+        record["url"], record["status"], record.get("headers", {}),
+        base64.b64decode(record.get("content", "")))
+    return cbor.dumps({
+        "url": record["url"],
+        "status": record["status"],
+        "response": pickle.dumps(response)})
+
+
+class Recorder(object):
+    ''' Appends every downloaded Response to a recording file. '''
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = Lock()
+
+    def record(self, url, resp):
+        raw = resp.raw_response
+        entry = {"url": url, "status": resp.status}
+        if raw is not None:
+            entry["headers"] = dict(getattr(raw, "headers", {}) or {})
+            entry["content"] = base64.b64encode(
+                raw.content or b"").decode("ascii")
+        with self.lock, open(self.path, "a") as file:
+            file.write(json.dumps(entry) + "\n")
+
+
+@lru_cache(maxsize=None)
+def get_recorder(path):
+    # one Recorder (and lock) per file for every worker in the process
+    return Recorder(path)
+
+
+class ReplayServer(Thread):
+    ''' Local stand-in for the cache server.
+
+    Answers http://<host>:<port>/?q=<url>&u=<agent> from a dict of
+    recordings (url -> record), optionally after a fixed latency.
+    address is the (host, port) pair to use as config.cache_server. '''
+
+    def __init__(self, recordings, host="127.0.0.1", port=0, latency=0.0):
+        self.recordings = recordings
+        self.latency = latency
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive like the real cache server. Headers and body go
+            # out in separate writes, so without TCP_NODELAY every reply on
+            # a reused connection waits for the client's delayed ACK.
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                url = query.get("q", [""])[0]
+                server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                body = encode_record(url, server.recordings.get(url))
+                self.send_response(200)
+                self.send_header("Content-Type", "application/cbor")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.address = self.server.server_address[:2]
+        super().__init__(daemon=True)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        return cls(load_recordings(path), **kwargs)
+
+    def run(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -1,14 +1,84 @@
 import pickle
 
+# content types the scraper parses; other bodies are skipped unparsed
+HTML_TYPES = ("text/html", "application/xhtml+xml")
+
+
+def _header(headers, name):
+    # case-insensitive lookup that also works on recorded plain dicts
+    name = name.lower()
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
 class Response(object):
+    ''' A cache server reply.
+
+    The pickled requests.Response is only unpickled when raw_response is
+    first read, so skip_reason can turn away oversized replies from their
+    payload size alone. size is the length of that payload in bytes. '''
+
     def __init__(self, resp_dict):
         self.url = resp_dict["url"]
         self.status = resp_dict["status"]
         self.error = resp_dict["error"] if "error" in resp_dict else None
-        try:
-            self.raw_response = (
-                pickle.loads(resp_dict["response"])
-                if "response" in resp_dict else
-                None)
-        except TypeError:
-            self.raw_response = None
+        # set by the downloader when it refused to read the reply
+        self.skipped = resp_dict.get("skipped")
+        self._payload = resp_dict.get("response")
+        self.size = (
+            len(self._payload)
+            if isinstance(self._payload, (bytes, bytearray)) else 0)
+        self._raw_response = None
+        self._loaded = False
+
+    @property
+    def raw_response(self):
+        if not self._loaded:
+            try:
+                self._raw_response = (
+                    pickle.loads(self._payload)
+                    if self._payload is not None else
+                    None)
+            except TypeError:
+                self._raw_response = None
+            self._payload = None
+            self._loaded = True
+        return self._raw_response
+
+    @raw_response.setter
+    def raw_response(self, raw_response):
+        self._raw_response = raw_response
+        self._payload = None
+        self._loaded = True
+
+    def header(self, name):
+        # a header of the origin response (unpickling it), or None
+        raw = self.raw_response
+        if raw is None:
+            return None
+        return _header(getattr(raw, "headers", None), name)
+
+    def skip_reason(self, max_size=0, content_types=HTML_TYPES):
+        # None if the body should be parsed, otherwise why not:
+        # "too_large" or "content_type". The payload size is checked
+        # before anything is unpickled.
+        if self.skipped:
+            return self.skipped
+        if self.status != 200:
+            return None
+        if max_size and self.size > max_size:
+            return "too_large"
+        raw = self.raw_response
+        if raw is None:
+            return None
+        headers = getattr(raw, "headers", None)
+        length = _header(headers, "Content-Length")
+        if max_size and length and length.isdigit() and int(length) > max_size:
+            return "too_large"
+        content_type = _header(headers, "Content-Type")
+        if content_types and content_type:
+            if content_type.split(";")[0].strip().lower() not in content_types:
+                return "content_type"
+        return None
@@ -0,0 +1,126 @@
+import os
+import math
+
+from array import array
+from hashlib import blake2b
+from threading import Lock
+
+
+def digest(key):
+    # 64-bit digest of a url (or of anything already reduced to an int).
+    # 0 marks an empty slot in SeenSet, so it is never returned.
+    if not isinstance(key, int):
+        key = int.from_bytes(
+            blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+    return key or 1
+
+
+class BloomFilter(object):
+    ''' Bit-array Bloom filter over 64-bit digests (double hashing). '''
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray(self.size // 8 + 1)
+
+    def _positions(self, value):
+        low, high = value & 0xFFFFFFFF, value >> 32
+        return ((low + i * high) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(value))
+
+
+class SeenSet(object):
+    ''' Compact set of urls for dedup.
+
+    Stores only a 64-bit digest per url in an array-backed open-addressing
+    table (linear probing, at most 3/4 full), 11-22 bytes per url
+    instead of a full url string plus dict entry. Membership is O(1) and
+    never touches disk. An optional Bloom filter answers most misses
+    before probing. '''
+
+    MAX_LOAD = 3 / 4
+
+    def __init__(self, capacity=1 << 16, bloom_capacity=0):
+        size = 8
+        while size * self.MAX_LOAD < capacity:
+            size <<= 1
+        self.table = array("Q", bytes(8 * size))
+        self.mask = size - 1
+        self.count = 0
+        self.lock = Lock()
+        self.bloom = BloomFilter(bloom_capacity) if bloom_capacity else None
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        # the stored digests, in table order
+        return (value for value in self.table if value)
+
+    def update(self, keys):
+        for key in keys:
+            self.add(key)
+
+    def _slot(self, table, mask, value):
+        index = (value ^ (value >> 32)) & mask
+        while table[index] and table[index] != value:
+            index = (index + 1) & mask
+        return index
+
+    def __contains__(self, key):
+        value = digest(key)
+        if self.bloom is not None and value not in self.bloom:
+            return False
+        table = self.table
+        return table[self._slot(table, len(table) - 1, value)] == value
+
+    def add(self, key):
+        # Returns True if key was not in the set before.
+        value = digest(key)
+        with self.lock:
+            index = self._slot(self.table, self.mask, value)
+            if self.table[index] == value:
+                return False
+            self.table[index] = value
+            self.count += 1
+            if self.bloom is not None:
+                self.bloom.add(value)
+            if self.count > len(self.table) * self.MAX_LOAD:
+                self._grow()
+            return True
+
+    def _grow(self):
+        old = self.table
+        table = array("Q", bytes(16 * len(old)))
+        mask = len(table) - 1
+        for value in old:
+            if value:
+                table[self._slot(table, mask, value)] = value
+        self.table, self.mask = table, mask
+
+    def save(self, path):
+        # Dump the digests (not the table) atomically.
+        with self.lock:
+            values = array("Q", iter(self))
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as file:
+            values.tofile(file)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, bloom_capacity=0):
+        values = array("Q")
+        with open(path, "rb") as file:
+            values.frombytes(file.read())
+        seen = cls(max(len(values), 1 << 16), bloom_capacity)
+        seen.update(values)
+        return seen
@@ -0,0 +1,122 @@
+import os
+
+from array import array
+from collections import deque
+from hashlib import blake2b
+from threading import Lock
+
+BITS = 64
+
+
+def token_hash(token):
+    return int.from_bytes(
+        blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def simhash(counts):
+    ''' 64-bit SimHash of a token -> weight mapping.
+
+    Weights are first summed per (byte position, byte value) so the cost
+    per token is 8 additions; the per-bit sums are then read off those
+    8 x 256 buckets. '''
+    buckets = [[0] * 256 for _ in range(8)]
+    total = 0
+    for token, weight in counts.items():
+        value = token_hash(token)
+        for byte in buckets:
+            byte[value & 0xFF] += weight
+            value >>= 8
+        total += weight
+
+    fingerprint = 0
+    for position, byte in enumerate(buckets):
+        for bit in range(8):
+            mask = 1 << bit
+            weight = sum(w for value, w in enumerate(byte) if value & mask)
+            if 2 * weight > total:
+                fingerprint |= 1 << (8 * position + bit)
+    return fingerprint
+
+
+class SimHashIndex(object):
+    ''' Fingerprints of pages seen so far, banded for fast lookup.
+
+    Two fingerprints within max_distance bits of each other agree
+    exactly on at least one of max_distance + 1 bands (pigeonhole), so a
+    lookup only compares against fingerprints sharing a band. At most
+    max_size fingerprints are kept (0 for no limit); past that the oldest
+    are forgotten first. '''
+
+    def __init__(self, max_distance=3, max_size=0):
+        self.max_distance = max_distance
+        self.max_size = max_size
+        self.bands = max_distance + 1
+        self.band_width = BITS // self.bands
+        self.band_mask = (1 << self.band_width) - 1
+        self.tables = [dict() for _ in range(self.bands)]
+        self.order = deque()
+        self.lock = Lock()
+
+    def __len__(self):
+        return len(self.order)
+
+    def __iter__(self):
+        # the stored fingerprints, oldest first
+        return iter(list(self.order))
+
+    def _keys(self, fingerprint):
+        return [
+            (fingerprint >> (band * self.band_width)) & self.band_mask
+            for band in range(self.bands)]
+
+    def find(self, fingerprint):
+        # Returns a stored fingerprint within max_distance bits, or None.
+        for table, key in zip(self.tables, self._keys(fingerprint)):
+            for other in table.get(key, ()):
+                if bin(fingerprint ^ other).count("1") <= self.max_distance:
+                    return other
+        return None
+
+    def add(self, fingerprint):
+        for table, key in zip(self.tables, self._keys(fingerprint)):
+            table.setdefault(key, list()).append(fingerprint)
+        self.order.append(fingerprint)
+        if self.max_size and len(self.order) > self.max_size:
+            self._remove(self.order.popleft())
+
+    def _remove(self, fingerprint):
+        for table, key in zip(self.tables, self._keys(fingerprint)):
+            bucket = table[key]
+            bucket.remove(fingerprint)
+            if not bucket:
+                del table[key]
+
+    def update(self, fingerprints):
+        for fingerprint in fingerprints:
+            self.add(fingerprint)
+
+    def check_and_add(self, fingerprint):
+        # True if a near-duplicate was already indexed; the fingerprint is
+        # only added when it is new.
+        with self.lock:
+            if self.find(fingerprint) is not None:
+                return True
+            self.add(fingerprint)
+            return False
+
+    def save(self, path):
+        # Dump the fingerprints, oldest first, atomically.
+        with self.lock:
+            values = array("Q", self.order)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as file:
+            values.tofile(file)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        # Add the fingerprints saved in path.
+        values = array("Q")
+        with open(path, "rb") as file:
+            values.frombytes(file.read())
+        with self.lock:
+            self.update(values)
@@ -0,0 +1,134 @@
+import os
+import re
+import mmap
+import struct
+import tempfile
+import zlib
+
+from collections import Counter
+from functools import lru_cache
+from threading import Lock
+
+from stopwords import STOPWORDS
+
+# maximal runs of ASCII letters, matched on lower-cased text; internal
+# apostrophes stay in the token, so contractions ("don't", "they're") are
+# looked up whole (and rejected as stopwords) instead of leaving "don", "re"
+TOKEN_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)*")
+
+# Compiled dictionary: the lower-cased English words minus the stopwords,
+# sorted into fixed-width records after a header (magic, record width,
+# record count, crc32 of the stopword list). Built from nltk on
+# first use, then mmap'd read-only so every worker thread and process
+# shares the same pages instead of its own Python set.
+VOCABULARY_FILE = os.path.join(os.path.dirname(__file__), "english_vocab.dat")
+_MAGIC = b"VOCAB\x01\x00\x00"
+_HEADER = struct.Struct("<8sIII")
+
+
+def _stopwords_crc():
+    return zlib.crc32("\n".join(sorted(STOPWORDS)).encode("utf-8"))
+
+
+class Vocabulary(object):
+    ''' Read-only sorted word table searched by bisection over an mmap. '''
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.width, self.count, self.crc = _HEADER.unpack_from(
+            self.data)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a vocabulary file.")
+
+    def _record(self, index):
+        start = _HEADER.size + index * self.width
+        return self.data[start:start + self.width].rstrip(b"\0")
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, word):
+        key = word.encode("ascii", "ignore")
+        if not key or len(key) > self.width:
+            return False
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            record = self._record(middle)
+            if record < key:
+                low = middle + 1
+            elif record > key:
+                high = middle
+            else:
+                return True
+        return False
+
+    @staticmethod
+    def build(path):
+        # the nltk corpus is only needed to (re)build the file
+        from nltk.corpus import words as english
+        stopwords = frozenset(STOPWORDS)
+        vocabulary = sorted(set(
+            word.lower().encode("ascii")
+            for word in english.words() if word.isascii()
+        ) - set(word.encode("ascii") for word in stopwords if word.isascii()))
+        width = max(len(word) for word in vocabulary)
+        # Shards may build at the same time: each writes its own temporary
+        # file and renames it into place, so readers only ever see a
+        # complete one.
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(_HEADER.pack(
+                    _MAGIC, width, len(vocabulary), _stopwords_crc()))
+                for word in vocabulary:
+                    file.write(word.ljust(width, b"\0"))
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+_vocabulary = None
+_vocabulary_lock = Lock()
+
+
+def get_vocabulary(path=VOCABULARY_FILE):
+    # Loads (building it if needed) the compiled dictionary on first use.
+    global _vocabulary
+    if _vocabulary is None:
+        with _vocabulary_lock:
+            if _vocabulary is None:
+                vocabulary = None
+                if os.path.exists(path):
+                    vocabulary = Vocabulary(path)
+                    if vocabulary.crc != _stopwords_crc():
+                        vocabulary = None
+                if vocabulary is None:
+                    Vocabulary.build(path)
+                    vocabulary = Vocabulary(path)
+                _vocabulary = vocabulary
+    return _vocabulary
+
+
+@lru_cache(maxsize=1 << 17)
+def is_counted(word):
+    # English non-stopword? Cached because the same words recur on every page.
+    return word in get_vocabulary()
+
+
+def tokenize(text):
+    # every token in text, lower-cased, in order (typographic apostrophes
+    # read as ASCII ones)
+    return TOKEN_PATTERN.findall(text.lower().replace("\u2019", "'"))
+
+
+def count_words(text):
+    # English non-stopword tokens of text with their counts
+    counts = Counter(tokenize(text))
+    return Counter({
+        word: count for word, count in counts.items() if is_counted(word)})
@@ -0,0 +1,119 @@
+import re
+
+from functools import lru_cache
+from urllib.parse import urlparse, parse_qs
+
+# Rules used by scraper.is_valid. Changing any of them changes
+# scraper.rules_fingerprint(), so pending urls are re-checked on resume.
+SCHEMES = frozenset(["http", "https"])
+
+# host suffix -> None to allow every path, a path to allow only that path,
+# or False to deny. The longest matching suffix wins.
+HOST_RULES = {
+    "ics.uci.edu": None,
+    "cs.uci.edu": None,
+    "informatics.uci.edu": None,
+    "stat.uci.edu": None,
+    # Special Link since it has more than netloc to check
+    "today.uci.edu": "/department/information_computer_sciences/",
+    # gitlab is evil
+    "gitlab.ics.uci.edu": False,
+}
+
+DATE_KEYWORDS = frozenset(["day", "month", "year", "date", "time"])
+DATE_PATTERN = re.compile(r"\d{4}[-/.]?\d{2}[-/.]?\d{2}")
+
+EXTENSIONS = frozenset([
+    "css", "js", "bmp", "gif", "jpg", "jpeg", "ico",
+    "png", "tif", "tiff", "mid", "mp2", "mp3", "mp4",
+    "wav", "avi", "mov", "mpeg", "ram", "m4v", "mkv", "ogg", "ogv", "pdf",
+    "ps", "eps", "tex", "ppt", "pptx", "doc", "docx", "xls", "xlsx", "names",
+    "data", "dat", "exe", "bz2", "tar", "msi", "bin", "7z", "psd", "dmg",
+    "iso", "img", "epub", "dll", "cnf", "tgz", "sha1",
+    "thmx", "mso", "arff", "rtf", "jar", "csv",
+    "rm", "smil", "wmv", "swf", "wma", "zip", "rar", "gz",
+    "sql", "apk", "bat"])
+
+
+def is_path_date(split_path):
+    # Checks if keywords for date are in the path.
+    for part in split_path:
+        if part.lower() in DATE_KEYWORDS or DATE_PATTERN.fullmatch(part):
+            return True
+    return False
+
+
+def is_query_date(query):
+    # Checks if keywords for date are in the query.
+    for key, values in query.items():
+        if key.lower() in DATE_KEYWORDS:
+            return True
+        # values is a list of every query for the given keyword
+        for value in values:
+            if DATE_PATTERN.fullmatch(value):
+                return True
+    return False
+
+
+class HostTrie(object):
+    ''' Maps host suffixes (matched on whole labels) to rules. '''
+
+    _RULE = object()
+
+    def __init__(self, rules):
+        self.root = dict()
+        for suffix, rule in rules.items():
+            node = self.root
+            for label in reversed(suffix.lower().split(".")):
+                node = node.setdefault(label, dict())
+            node[self._RULE] = rule
+
+    def match(self, hostname):
+        # Returns (True, rule) for the longest matching suffix, or
+        # (False, None) when no suffix matches.
+        found, rule = False, None
+        node = self.root
+        for label in reversed(hostname.split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            if self._RULE in node:
+                found, rule = True, node[self._RULE]
+        return found, rule
+
+
+class UrlFilter(object):
+    ''' The is_valid rules, compiled once.
+
+    check() returns None for a url that should be crawled, otherwise the
+    name of the rule that rejected it. Results are cached per url. '''
+
+    def __init__(self, host_rules=HOST_RULES, cache_size=1 << 16):
+        self.hosts = HostTrie(host_rules)
+        self.check = lru_cache(maxsize=cache_size)(self._check)
+
+    def _check(self, url):
+        # Ex. Scheme="https", Netloc="www.helloworld.com", Path="/path/.../,
+        # Params="", query="query=int"
+        parsed = urlparse(url)
+        if parsed.scheme not in SCHEMES:
+            return "scheme"
+
+        hostname = parsed.hostname
+        found, rule = self.hosts.match(hostname) if hostname else (False, None)
+        if not found:
+            return "domain"
+        if rule is False:
+            return "denied_host"
+        if rule is not None and parsed.path.rstrip("/") != rule.rstrip("/"):
+            return "denied_path"
+
+        if is_path_date(parsed.path.split("/")):
+            return "date"
+        if parsed.query and is_query_date(parse_qs(parsed.query)):
+            return "date"
+
+        path = parsed.path.lower()
+        if "." in path and path.rpartition(".")[2] in EXTENSIONS:
+            return "extension"
+        return None